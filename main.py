@@ -2,38 +2,77 @@
 Wayfair Studio Backend — FastAPI application entry point.
 
 Registers all HTTP routes, mounts static file directories, and runs a
-background thread at startup to pre-populate step descriptions in the DB so
-that the first request for each step is fast.
+background thread at startup to pre-populate step descriptions and orientation
+transitions in the DB so that the first request for each step is fast.
 
-Static mounts:
+Static mounts (content-hash ETags, ?v=<hash> URLs cached as immutable):
   /manuals/*          → public/manuals/   (step PNGs and GLB files)
   /lasso_screenshots/* → lasso_screenshots/
+  /tts_audio/*        → cache/tts/        (cached TTS clips)
   /spatial_viewer/*   → services/spatial-viewer/index.html (Three.js viewer)
 """
 
 import os
 import json
+import asyncio
 import threading
 from typing import List, Optional
-from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi import FastAPI, File, Form, HTTPException, Request, Response, UploadFile, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 from pathlib import Path
 import tempfile
-from services.text_extraction import get_step_explanation, preload_manual_step_explanations, discover_step_numbers
-from services.db import _ensure_table_exists, get_cached_value, get_manuals, get_manual, get_steps_for_manual, get_pages_for_manual, update_page_boxes
+from services.text_extraction import get_step_explanation, preload_manual_step_explanations
+from services.manual_assets import discover_step_numbers, find_step_image, manual_exists
+from services.db import _ensure_table_exists, get_cached_value, get_column_for_manual, get_manuals, get_manual, get_pages_for_manual, update_page_boxes
 from services.db_columns import StepColumn
 from services.chat_service import get_chat_response, get_chat_response_stream
-from services.manual_processor import start_manual_processing, get_job_status, segment_manual_into_steps
-from services.orientation_generator import start_orientation_generation
+from services.manual_processor import (
+    start_manual_processing,
+    get_job_status,
+    missing_page_images,
+    segment_manual_into_steps,
+)
+from services.orientation_generator import (
+    start_orientation_generation,
+    get_orientation_queue_status,
+    precompute_enabled,
+    precompute_manual_orientation,
+    wait_for_orientation,
+)
 from services.step_colorizer import get_step_image_url
-from services.lasso import LassoImageData
+from services.lasso import LassoImageData, store_lasso_stream
 from services.step_checklist import generate_checklist
-from services.transcription import transcribe_audio
-from services.tts import synthesize_speech
+from services.voice_pipeline import run_voice_turn
+from services.narration import narration_enabled, preload_manual_narration
+from services.serialization import FastJSONResponse, sse_response
+from services.compression import CompressionMiddleware
+from services.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, RequestTimingMiddleware, render_metrics
+from services.static_assets import (
+    AssetStaticFiles,
+    ASSET_MAX_AGE,
+    IMMUTABLE_CACHE_CONTROL,
+    asset_version,
+    content_digest,
+)
+from services.glb_pipeline import build_manual_lods, build_step_lods, get_step_lods, store_step_model
+from services.image_optimizer import optimize_manual_images
+from services.image_variants import DEFAULT_FORMAT, DEFAULT_QUALITY, MEDIA_TYPES, get_variant
+from services.step_sprites import get_sprite_image, get_step_sprite
+from services.steps_listing import get_steps_listing, etag_matches, invalidate_steps_listing
+from services.transcription import (
+    transcribe_audio,
+    transcribe_audio_bytes,
+    transcribe_audio_file,
+    transcription_executor,
+    audio_extension,
+    AudioTooLargeError,
+)
+from services.vad import StreamingVAD
+from services.tts import synthesize_speech, synthesize_speech_stream, TTS_CACHE_DIR, TTS_URL_PREFIX
 
 BASE_DIR = Path(__file__).resolve().parent
 MANUALS_DIR = BASE_DIR / "public" / "manuals"
@@ -48,18 +87,43 @@ class ChatRequest(BaseModel):
 
 load_dotenv()
 
-app = FastAPI()
+# orjson-backed JSON for every route (falls back to json if orjson is missing)
+app = FastAPI(default_response_class=FastJSONResponse)
+
+def preload_manual(manual_id: int) -> None:
+    """
+    Warm every per-step cache for a manual: the thumbnail sprite, GLB LODs,
+    descriptions, then orientation transitions, then narration (which reads both).
+    """
+    try:
+        get_step_sprite(manual_id)
+    except Exception as e:
+        print(f"[Sprites] Manual {manual_id} failed: {e}")
+    build_manual_lods(manual_id)
+    preload_manual_step_explanations(manual_id=manual_id)
+    if precompute_enabled():
+        try:
+            precompute_manual_orientation(manual_id)
+        except Exception as e:
+            print(f"Orientation batch: manual {manual_id} failed: {e}")
+    if narration_enabled():
+        try:
+            if preload_manual_narration(manual_id=manual_id):
+                invalidate_steps_listing(manual_id)
+        except Exception as e:
+            print(f"Narration: manual {manual_id} failed: {e}")
+
 
 @app.on_event("startup")
 def startup_event():
     _ensure_table_exists()
-    # Preload step explanations for each manual that has images under public/manuals/<id>/
+    # Preload step caches for each manual that has images under public/manuals/<id>/
     def preload_all_manuals():
         if not MANUALS_DIR.exists():
             return
         for path in MANUALS_DIR.iterdir():
             if path.is_dir() and path.name.isdigit():
-                preload_manual_step_explanations(manual_id=int(path.name))
+                preload_manual(int(path.name))
     thread = threading.Thread(target=preload_all_manuals, daemon=True)
     thread.start()
 
@@ -75,23 +139,32 @@ app.add_middleware(
 )
 
 # custom middleware for image CORS headers
+# (Cache-Control and validators for assets are set by AssetStaticFiles)
 @app.middleware("http")
 async def add_image_cors_headers(request, call_next):
     response = await call_next(request)
-    if request.url.path.startswith("/manuals/"):
+    if request.url.path.startswith("/manuals/") or request.url.path.endswith(("/image/variant", "/sprite/image")):
         response.headers["Access-Control-Allow-Origin"] = "*"
         response.headers["Cross-Origin-Resource-Policy"] = "cross-origin"
-        if response.status_code == 200:
-            response.headers["Cache-Control"] = "public, max-age=3600"
     return response
 
+# gzip/brotli for JSON and HTML; SSE and binary assets pass through
+app.add_middleware(CompressionMiddleware)
+
+# Outermost: per-route latency histograms for /metrics
+app.add_middleware(RequestTimingMiddleware)
+
 # Serve static files: public/manuals/<id>/stepN.png at /manuals/<id>/stepN.png
-app.mount("/manuals", StaticFiles(directory=MANUALS_DIR), name="manuals")
+app.mount("/manuals", AssetStaticFiles(directory=MANUALS_DIR), name="manuals")
 
 # Serve lasso screenshots
 LASSO_STORAGE_DIR = Path(__file__).resolve().parent / "lasso_screenshots"
 LASSO_STORAGE_DIR.mkdir(exist_ok=True)
-app.mount("/lasso_screenshots", StaticFiles(directory=LASSO_STORAGE_DIR), name="lasso_screenshots")
+app.mount("/lasso_screenshots", AssetStaticFiles(directory=LASSO_STORAGE_DIR), name="lasso_screenshots")
+
+# Serve cached TTS audio
+TTS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+app.mount(TTS_URL_PREFIX, AssetStaticFiles(directory=TTS_CACHE_DIR), name="tts_audio")
 
 # Serve spatial viewer
 SPATIAL_VIEWER_DIR = Path(__file__).resolve().parent / "services" / "spatial-viewer"
@@ -103,6 +176,12 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+def metrics_endpoint():
+    """Prometheus text-format metrics: request/DB/Replicate latency and cache hit ratios."""
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/api/manuals")
 def list_manuals_endpoint():
     """
@@ -122,57 +201,31 @@ def get_manual_endpoint(manual_id: int):
     manual = get_manual(manual_id)
     if manual is not None:
         return manual
-    manual_dir = MANUALS_DIR / str(manual_id)
-    if manual_dir.exists() and manual_dir.is_dir():
+    if manual_exists(manual_id):
         return {"id": manual_id, "name": f"Manual {manual_id}", "slug": f"manual-{manual_id}"}
     raise HTTPException(status_code=404, detail="Manual not found")
 
 
-def _normalize_step(s: dict) -> dict:
-    """Ensure each step has id (for UI keys) and consistent shape."""
-    n = s.get("step_number")
-    return {
-        "id": n,
-        "step_number": n,
-        "title": f"Step {n}" if n is not None else None,
-        "image_url": s.get("image_url"),
-        "description": s.get("description"),
-    }
-
-
 @app.get("/api/manuals/{manual_id}/steps")
-def list_steps_endpoint(manual_id: int):
+def list_steps_endpoint(manual_id: int, request: Request):
     """
     Return all steps for a manual.
-    Response: list of { "id", "step_number", "image_url", "description" }.
+    Response: { "steps": [ { "id", "step_number", "title", "image_url", "description",
+    "narration_url", "orientation_narration_url", "srcset" } ] } (narration URLs
+    are null until pre-generated, see services/narration.py; srcset lists
+    WebP variants of the step image).
     Uses DB when available; falls back to filesystem (public/manuals/<id>/stepN.png|.jpg) when no steps in DB.
+    The encoded response is prebuilt per manual (services/steps_listing.py) and
+    carries an ETag; a matching If-None-Match gets 304 Not Modified.
     """
-    manual = get_manual(manual_id)
-    if manual is None:
-        manual_dir = MANUALS_DIR / str(manual_id)
-        if not manual_dir.exists() or not manual_dir.is_dir():
-            raise HTTPException(status_code=404, detail="Manual not found")
-    # manual exists in DB or on disk
-    steps = get_steps_for_manual(manual_id)
-    if not steps:
-        base_url = os.getenv("APP_URL", "http://localhost:4000").rstrip("/")
-        step_nums = discover_step_numbers(manual_id)
-        manual_dir = MANUALS_DIR / str(manual_id)
-        steps = []
-        for n in step_nums:
-            ext = ".png"
-            for e in (".png", ".jpg"):
-                if (manual_dir / f"step{n}{e}").exists():
-                    ext = e
-                    break
-            steps.append({
-                "step_number": n,
-                "image_url": f"{base_url}/manuals/{manual_id}/step{n}{ext}",
-                "description": None,
-            })
-    normalized = [_normalize_step(s) for s in steps]
-    # Return object with "steps" key so frontends using response.steps get the list
-    return {"steps": normalized}
+    listing = get_steps_listing(manual_id)
+    if listing is None:
+        raise HTTPException(status_code=404, detail="Manual not found")
+    body, etag = listing
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @app.get("/api/manuals/{manual_id}/steps/{step_id}/explanation")
@@ -226,6 +279,104 @@ def step_image_endpoint(manual_id: int, step_id: int, colorized: bool = False):
         raise HTTPException(status_code=404, detail=str(e))
 
 
+@app.get("/api/manuals/{manual_id}/steps/{step_id}/image/variant")
+def step_image_variant_endpoint(
+    manual_id: int,
+    step_id: int,
+    request: Request,
+    width: int = 640,
+    format: str = DEFAULT_FORMAT,
+    quality: int = DEFAULT_QUALITY,
+    v: Optional[str] = None,
+):
+    """
+    Return a resized, re-encoded copy of a step image (see services/image_variants.py).
+
+    Query params: width (snapped up to 160/320/640/960/1280/1920, never above
+    the original), format (webp | avif | jpeg), quality (30–95). URLs carrying
+    the source's ?v=<content hash>, as returned in the steps listing's srcset,
+    are cached as immutable.
+    """
+    try:
+        source = find_step_image(manual_id, step_id)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    fmt = format.lower()
+    try:
+        path = get_variant(source, width, fmt, quality)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    headers = {
+        "ETag": f'"{content_digest(path)[:32]}"',
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if v == asset_version(source) else f"public, max-age={ASSET_MAX_AGE}",
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=MEDIA_TYPES[fmt], headers=headers)
+
+
+@app.get("/api/manuals/{manual_id}/sprite")
+def step_sprite_endpoint(manual_id: int, request: Request):
+    """
+    Return the thumbnail sprite map for the step navigator rail.
+    Response: { "manual_id", "version", "image_url", "format", "width", "height",
+    "cell": { "width", "height" }, "steps": [ { "step_number", "x", "y", "w", "h" } ] }.
+    """
+    sprite_map = get_step_sprite(manual_id)
+    if sprite_map is None:
+        raise HTTPException(status_code=404, detail="No step images for this manual")
+    headers = {"ETag": f'"{sprite_map["version"]}"', "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse(sprite_map, headers=headers)
+
+
+@app.get("/api/manuals/{manual_id}/sprite/image")
+def step_sprite_image_endpoint(manual_id: int, request: Request, v: Optional[str] = None):
+    """Return the sprite sheet image; immutable when ?v= matches the current version."""
+    sprite = get_sprite_image(manual_id)
+    if sprite is None:
+        raise HTTPException(status_code=404, detail="No step images for this manual")
+    path, version = sprite
+    headers = {
+        "ETag": f'"{version}"',
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if v == version else f"public, max-age={ASSET_MAX_AGE}",
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=f"image/{path.suffix.lstrip('.')}", headers=headers)
+
+
+@app.post("/api/manuals/{manual_id}/steps/{step_id}/model")
+def upload_step_model_endpoint(manual_id: int, step_id: int, file: UploadFile = File(...)):
+    """
+    Upload a step's 3D model (.glb) and build its LODs (see services/glb_pipeline.py).
+    Response: { "manual_id", "step_number", "lods": [...] } as for GET .../model/lods.
+    """
+    try:
+        store_step_model(manual_id, step_id, file.file)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    build_step_lods(manual_id, step_id, force=True)
+    return {"manual_id": manual_id, "step_number": step_id, "lods": get_step_lods(manual_id, step_id)}
+
+
+@app.get("/api/manuals/{manual_id}/steps/{step_id}/model/lods")
+def step_model_lods_endpoint(manual_id: int, step_id: int):
+    """
+    List the available levels of detail for a step's 3D model, most detailed first.
+    Response: { "manual_id", "step_number", "lods": [ { "level", "ratio", "url", "size", "compressed" } ] }.
+    LOD URLs carry ?v=<content hash> and are cached as immutable. Only reads the
+    LOD manifest (builds happen on upload and in preload_manual); until LODs
+    exist for the current model, the original GLB is the only level.
+    """
+    lods = get_step_lods(manual_id, step_id)
+    if lods is None:
+        raise HTTPException(status_code=404, detail=f"No model for step {step_id} of manual {manual_id}")
+    return {"manual_id": manual_id, "step_number": step_id, "lods": lods}
+
+
 @app.post("/api/manuals/{manual_id}/steps/{step_id}/chat")
 def chat_endpoint(manual_id: int, step_id: int, request: ChatRequest):
     """
@@ -254,7 +405,7 @@ def chat_endpoint(manual_id: int, step_id: int, request: ChatRequest):
             secondary_image_url=request.secondary_image_url,
             intent=request.intent,
         )
-        return result
+        return FastJSONResponse(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -262,23 +413,22 @@ def chat_endpoint(manual_id: int, step_id: int, request: ChatRequest):
 def get_step_image_path(manual_id: int = 1, step_number: int = None):
     """
     Helper to get local file path for a given step.
-    Looks under public/manuals/<manual_id>/ for step<N>.png or step<N>.jpg.
+    Resolved through the cached manual asset index (services/manual_assets.py).
     """
-    manual_dir = MANUALS_DIR / str(manual_id)
-    for ext in (".png", ".jpg"):
-        image_path = manual_dir / f"step{step_number}{ext}"
-        if image_path.exists():
-            return image_path
-    raise FileNotFoundError(f"Step image not found: {manual_dir}/step{step_number}.png|.jpg")
+    return find_step_image(manual_id, step_number)
 
 
 @app.post("/api/orientation/generate")
-def generate_orientation_endpoint(manual_id: int, from_step: int, to_step: int):
+def generate_orientation_endpoint(manual_id: int, from_step: int, to_step: int, client_id: Optional[str] = None):
     """
     Start background generation of orientation text for a step transition.
     Returns immediately without waiting for analysis to complete.
+    Pass a per-viewer `client_id` so jobs this viewer has flipped past are
+    cancelled without touching other viewers' jobs.
     
-    Response: { "status": "started" or "completed" }
+    Response: { "status": "completed" | "started" | "queued" | "running" | "rejected" }
+    ("queued"/"running" mean the same transition is already in flight;
+    "rejected" means the worker queue is full).
     """
 
     # Check cache
@@ -293,24 +443,90 @@ def generate_orientation_endpoint(manual_id: int, from_step: int, to_step: int):
     if cached_text:
         return {"status": "completed"}
     
-    start_orientation_generation(
+    status = start_orientation_generation(
         manual_id=manual_id,
         from_step=from_step,
-        to_step=to_step
+        to_step=to_step,
+        client_id=client_id,
     )
-    return {"status": "started"}
+    return {"status": status}
+
+
+@app.get("/api/orientation/status")
+def orientation_status_endpoint():
+    """
+    Show the orientation worker pool: which transitions are queued or running.
+
+    Response: { "workers", "max_queue", "running": [...], "queued": [...] }
+    """
+    return get_orientation_queue_status()
 
 
 @app.get("/api/orientation/text")
 def get_orientation_text_endpoint(manual_id: int, step: int):
     """
-    Get cached orientation text for a step.
+    Get cached orientation text for a step. Pure cache read: results are
+    precomputed per manual, with /api/orientation/generate as a fallback.
     
     Response: { "text": null } or { "text": "{\"show_popup\": true, \"message\": \"...\"}" }
     """
     text = get_cached_value(manual_id, step, StepColumn.ORIENTATION_TEXT, returnMetadata=False)
     return {"text": text}
 
+
+ORIENTATION_WAIT_MAX_SECONDS = 60
+
+
+@app.get("/api/orientation/wait")
+async def wait_orientation_text_endpoint(
+    manual_id: int,
+    step: int,
+    to_step: Optional[int] = None,
+    timeout: float = 25,
+    client_id: Optional[str] = None,
+):
+    """
+    Long-poll for the orientation text of a step: returns as soon as it is
+    stored, or after `timeout` seconds (capped at 60). With `to_step`, a
+    generation job is queued first if the result is not cached yet.
+
+    Response: { "status": "ready", "text": {"show_popup": ..., "message": ...} }
+    or { "status": "timeout", "text": null }
+    """
+    if to_step is not None:
+        cached = await asyncio.to_thread(
+            get_cached_value, manual_id, step, StepColumn.ORIENTATION_TEXT, False
+        )
+        if cached:
+            return {"status": "ready", "text": cached}
+        start_orientation_generation(manual_id=manual_id, from_step=step, to_step=to_step, client_id=client_id)
+
+    timeout = max(0.0, min(timeout, ORIENTATION_WAIT_MAX_SECONDS))
+    text = await wait_for_orientation(manual_id, step, timeout)
+    return {"status": "ready" if text else "timeout", "text": text}
+
+
+@app.get("/api/manuals/{manual_id}/orientation")
+def list_orientation_endpoint(manual_id: int):
+    """
+    Return every consecutive-step orientation transition for a manual in one response.
+
+    Response: { "manual_id", "transitions": [ { "from_step", "to_step",
+    "orientation": {show_popup, message} | null } ] } (null = not computed yet).
+    """
+    step_numbers = discover_step_numbers(manual_id)
+    cached = get_column_for_manual(manual_id, StepColumn.ORIENTATION_TEXT)
+    transitions = []
+    for from_step, to_step in zip(step_numbers, step_numbers[1:]):
+        orientation = cached.get(from_step)
+        if isinstance(orientation, str):
+            try:
+                orientation = json.loads(orientation)
+            except ValueError:
+                orientation = None
+        transitions.append({"from_step": from_step, "to_step": to_step, "orientation": orientation})
+    return {"manual_id": manual_id, "transitions": transitions}
+
 @app.post("/api/lasso/upload")
 def lasso_upload_endpoint(data: LassoImageData):
     """Save lasso screenshot and analyze with AI"""
@@ -320,6 +536,24 @@ def lasso_upload_endpoint(data: LassoImageData):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/lasso/upload-file")
+def lasso_upload_file_endpoint(
+    file: UploadFile = File(...),
+    step: int = Form(...),
+    manual_id: int = Form(1),
+):
+    """
+    Multipart variant of /api/lasso/upload: the crop is sent as a binary file
+    part and streamed straight to disk instead of travelling as base64 JSON.
+    Response shape is identical.
+    """
+    try:
+        from services.lasso import analyze_lasso_crop
+        lasso_path = store_lasso_stream(file.file)
+        return analyze_lasso_crop(lasso_path, step, manual_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 class TranscribeRequest(BaseModel):
     audio: str  # base64-encoded WAV audio
 
@@ -330,10 +564,103 @@ def transcribe_endpoint(data: TranscribeRequest):
     try:
         result = transcribe_audio(data.audio)
         return result
+    except AudioTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/transcribe/upload")
+def transcribe_upload_endpoint(file: UploadFile = File(...)):
+    """
+    Multipart variant of /api/transcribe: the recording is sent as a binary
+    file part and handed to Whisper without base64 decoding or a temp-file copy.
+    """
+    try:
+        ext = audio_extension(file.content_type, file.filename)
+        return transcribe_audio_file(file.file, ext)
+    except AudioTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.websocket("/ws/transcribe")
+async def transcribe_ws_endpoint(websocket: WebSocket, sample_rate: int = 16000):
+    """
+    Incremental transcription over a WebSocket.
+
+    The client streams raw 16-bit little-endian mono PCM (at `sample_rate`) as
+    binary frames and sends the text frame "end" when recording stops. Local
+    VAD splits the stream into utterances, which are transcribed in parallel
+    as they complete. Server messages (JSON):
+      {"type": "partial", "index": 0, "text": "...", "transcript": "..."}
+      {"type": "error", "index": 1, "detail": "..."}
+      {"type": "final", "text": "full transcript"}
+    `transcript` is the text of all utterances finished so far, in order.
+    A `sample_rate` outside 8000–48000 Hz closes the socket with code 1008.
+    """
+    await websocket.accept()
+    try:
+        vad = StreamingVAD(sample_rate)
+    except ValueError as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1008)
+        return
+    except RuntimeError as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close()
+        return
+
+    loop = asyncio.get_running_loop()
+    send_lock = asyncio.Lock()
+    texts: dict[int, str] = {}
+    tasks: list[asyncio.Task] = []
+
+    def joined() -> str:
+        return " ".join(texts[i] for i in sorted(texts) if texts[i])
+
+    async def transcribe_chunk(index: int, wav: bytes):
+        try:
+            result = await loop.run_in_executor(transcription_executor, transcribe_audio_bytes, wav, ".wav")
+            texts[index] = result["text"]
+            message = {"type": "partial", "index": index, "text": result["text"], "transcript": joined()}
+        except Exception as e:
+            texts[index] = ""
+            message = {"type": "error", "index": index, "detail": str(e)}
+        async with send_lock:
+            try:
+                await websocket.send_json(message)
+            except (WebSocketDisconnect, RuntimeError) as e:
+                # Client went away; the receive loop sees the disconnect
+                print(f"[Transcribe] Could not send utterance {index}: {e}")
+
+    def submit(wav: bytes):
+        tasks.append(asyncio.create_task(transcribe_chunk(len(tasks), wav)))
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                for wav in vad.feed(message["bytes"]):
+                    submit(wav)
+            elif (message.get("text") or "").strip() == "end":
+                break
+
+        tail = vad.flush()
+        if tail:
+            submit(tail)
+        await asyncio.gather(*tasks)
+        async with send_lock:
+            await websocket.send_json({"type": "final", "text": joined()})
+        await websocket.close()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
 class TTSRequest(BaseModel):
     text: str
     voice: str = "af_nova"
@@ -342,6 +669,8 @@ class TTSRequest(BaseModel):
 @app.post("/api/tts")
 def tts_endpoint(data: TTSRequest):
     """Convert text to speech using Kokoro-82m."""
+    if not data.text.strip():
+        raise HTTPException(status_code=400, detail="Text cannot be empty")
     try:
         audio_url = synthesize_speech(data.text, data.voice)
         return {"audio_url": audio_url}
@@ -349,35 +678,63 @@ def tts_endpoint(data: TTSRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/tts/stream")
+def tts_stream_endpoint(data: TTSRequest):
+    """
+    Stream text-to-speech as Server-Sent Events, one event per sentence.
+
+    Sentences are synthesized concurrently and emitted in order, so the client
+    can start playing the first clip while the rest are still being generated:
+      data: {"event":"chunk","index":0,"text":"...","audio_url":"...","elapsed_ms":850}
+      data: {"event":"done","chunks":3,"time_to_first_chunk_ms":850,"total_ms":1900}
+      data: [DONE]
+    """
+    # Validate before the 200 goes out; errors inside the stream become [ERROR] frames
+    if not data.text.strip():
+        raise HTTPException(status_code=400, detail="Text cannot be empty")
+    return sse_response(synthesize_speech_stream(data.text, data.voice))
+
+
 @app.post("/api/manuals/{manual_id}/steps/{step_number}/chat-stream")
 def chat_stream_endpoint(manual_id: int, step_number: int, body: ChatRequest):
     """Stream a chat response as Server-Sent Events."""
-    def event_generator():
-        try:
-            for chunk in get_chat_response_stream(
-                manual_id=manual_id,
-                step_number=step_number,
-                user_message=body.message,
-                conversation_history=body.history,
-                image_url=body.image_url,
-                secondary_image_url=body.secondary_image_url,
-                intent=body.intent,
-            ):
-                # SSE format: each event is "data: <single-line JSON>\n\n"
-                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
-            yield "data: [DONE]\n\n"
-        except Exception as e:
-            error_text = str(e).replace("\n", " ").replace("\r", " ")
-            yield f"data: [ERROR] {error_text}\n\n"
-
-    return StreamingResponse(
-        event_generator(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-        },
-    )
+    # SSE format: each event is "data: <single-line JSON>\n\n"
+    return sse_response(get_chat_response_stream(
+        manual_id=manual_id,
+        step_number=step_number,
+        user_message=body.message,
+        conversation_history=body.history,
+        image_url=body.image_url,
+        secondary_image_url=body.secondary_image_url,
+        intent=body.intent,
+    ))
+
+class VoiceTurnRequest(BaseModel):
+    audio: str  # base64-encoded audio (data URI or raw)
+    history: Optional[list[dict]] = None
+    image_url: Optional[str] = None
+    secondary_image_url: Optional[str] = None
+    intent: Optional[str] = None
+    voice: str = "af_nova"
+
+
+@app.post("/api/manuals/{manual_id}/steps/{step_number}/voice")
+def voice_turn_endpoint(manual_id: int, step_number: int, body: VoiceTurnRequest):
+    """
+    Run a whole voice turn (transcribe → chat → TTS) in one request, streamed
+    as Server-Sent Events: transcript, final chat payload, per-sentence audio
+    URLs, then per-stage timings. See services/voice_pipeline.py.
+    """
+    return sse_response(run_voice_turn(
+        manual_id=manual_id,
+        step_number=step_number,
+        audio_base64=body.audio,
+        conversation_history=body.history,
+        image_url=body.image_url,
+        secondary_image_url=body.secondary_image_url,
+        intent=body.intent,
+        voice=body.voice,
+    ))
 
 # Manual processing / segmentation endpoints
 
@@ -412,7 +769,8 @@ def process_manual_endpoint(
 def get_manual_pages_endpoint(manual_id: int):
    """Return all pages for a manual with their bounding boxes."""
    pages = get_pages_for_manual(manual_id)
-   return {"pages": pages}
+   # Returned directly: box arrays are large and need no jsonable_encoder pass
+   return FastJSONResponse({"pages": pages})
 
 class ConfirmSegmentationRequest(BaseModel):
    pages: List[dict] # list of {page_number: int, boxes: list}
@@ -422,12 +780,27 @@ def confirm_segmentation_endpoint(manual_id: int, request: ConfirmSegmentationRe
    """
    Receive confirmed/edited bounding boxes and trigger Phase 2 (cropping).
    """
+   # Refuse before writing boxes, so pages are never CONFIRMED with boxes that cannot be applied
+   missing = missing_page_images(manual_id, [p["page_number"] for p in request.pages])
+   if missing:
+       raise HTTPException(
+           status_code=409,
+           detail=f"Page images {missing} for manual {manual_id} are missing; "
+           "they are removed after segmentation when KEEP_PAGE_IMAGES=0",
+       )
    for p in request.pages:
        update_page_boxes(manual_id, p["page_number"], p["boxes"])
   
    # trigger Phase 2 synchronously for now, or background it
-   total_steps = segment_manual_into_steps(manual_id)
-   return {"status": "completed", "step_count": total_steps}
+   try:
+       total_steps = segment_manual_into_steps(manual_id)
+   except FileNotFoundError as e:
+       raise HTTPException(status_code=409, detail=str(e))
+   # Shrink step crops and drop the page renders before anything reads them
+   storage = optimize_manual_images(manual_id)
+   # Warm descriptions, orientation transitions and narration for the new steps
+   threading.Thread(target=preload_manual, args=(manual_id,), daemon=True).start()
+   return {"status": "completed", "step_count": total_steps, "storage": storage}
 
 @app.get("/api/manuals/process/{job_id}")
 def get_process_status(job_id: str):
@@ -0,0 +1,91 @@
+# scripts/bench_asset_serving.py
+"""
+Compare the static asset serving paths on multi-megabyte files:
+
+  staticfiles     Starlette's StaticFiles (the previous /manuals mount)
+  asset-read      AssetStaticFiles, chunked reads
+  asset-range     AssetStaticFiles, random 1 MB Range requests (206)
+
+Requests are driven straight through the ASGI apps (no sockets), so the
+numbers isolate the Python side of serving: wall-clock throughput and
+process CPU seconds per GB served. Zero-copy (zerocopysend / SENDFILE_HEADER)
+moves the transfer out of Python entirely and is not measured here.
+
+Usage:
+    python scripts/bench_asset_serving.py [file_mb] [requests]
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from starlette.staticfiles import StaticFiles  # noqa: E402
+
+from services.static_assets import AssetStaticFiles  # noqa: E402
+
+
+async def _request(app, name: str, headers=None) -> int:
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": f"/{name}",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(k.encode(), v.encode()) for k, v in (headers or {}).items()],
+    }
+    received = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal received
+        if message["type"] == "http.response.body":
+            received += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return received
+
+
+async def _run(app, name: str, requests: int, size: int, ranged: bool) -> tuple:
+    rng = random.Random(0)
+    total = 0
+    wall, cpu = time.perf_counter(), time.process_time()
+    for _ in range(requests):
+        headers = None
+        if ranged:
+            start = rng.randrange(0, max(1, size - 1024 * 1024))
+            headers = {"range": f"bytes={start}-{start + 1024 * 1024 - 1}"}
+        total += await _request(app, name, headers)
+    return total, time.perf_counter() - wall, time.process_time() - cpu
+
+
+def _report(label: str, total: int, wall: float, cpu: float) -> None:
+    gb = total / 1e9
+    print(f"  {label:<12} {total / wall / 1e6:9.1f} MB/s   {cpu / gb if gb else 0:7.3f} CPU s/GB")
+
+
+async def main():
+    file_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "model.glb"
+        path.write_bytes(os.urandom(file_mb * 1024 * 1024))
+        size = path.stat().st_size
+        baseline = StaticFiles(directory=tmp)
+        assets = AssetStaticFiles(directory=tmp)
+
+        print(f"{file_mb} MB file, {requests} requests each:")
+        _report("staticfiles", *await _run(baseline, path.name, requests, size, False))
+
+        _report("asset-read", *await _run(assets, path.name, requests, size, False))
+        _report("asset-range", *await _run(assets, path.name, requests, size, True))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,74 @@
+# scripts/bench_image_prep.py
+"""
+Report bytes saved by services/image_prep.py for every step image under
+public/manuals/, and (with --upload and REPLICATE_API_TOKEN set) the upload
+latency of the original vs prepared file through Replicate's file API.
+
+Usage:
+    python scripts/bench_image_prep.py [--upload]
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.image_prep import prepare_image, get_image_prep_stats  # noqa: E402
+
+load_dotenv()
+
+MANUALS_DIR = Path(__file__).resolve().parent.parent / "public" / "manuals"
+
+
+def _timed_upload(path: Path) -> float:
+    import replicate
+
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        uploaded = replicate.files.create(f)
+    elapsed = time.perf_counter() - start
+    try:
+        replicate.files.delete(uploaded.id)
+    except Exception:
+        pass
+    return elapsed
+
+
+def main():
+    upload = "--upload" in sys.argv and bool(os.getenv("REPLICATE_API_TOKEN"))
+    images = sorted(MANUALS_DIR.glob("*/step*.png")) + sorted(MANUALS_DIR.glob("*/step*.jpg"))
+    if not images:
+        print("No step images found")
+        return
+
+    total_orig = total_prep = 0
+    total_orig_s = total_prep_s = 0.0
+    for path in images:
+        prepared = prepare_image(path)
+        orig_size = path.stat().st_size
+        prep_size = prepared.stat().st_size
+        total_orig += orig_size
+        total_prep += prep_size
+        line = f"{path.relative_to(MANUALS_DIR)}: {orig_size / 1024:.0f} KB -> {prep_size / 1024:.0f} KB"
+        if upload:
+            orig_s = _timed_upload(path)
+            prep_s = _timed_upload(prepared)
+            total_orig_s += orig_s
+            total_prep_s += prep_s
+            line += f" | upload {orig_s * 1000:.0f} ms -> {prep_s * 1000:.0f} ms"
+        print(line)
+
+    saved = total_orig - total_prep
+    print(f"\n{len(images)} images: {total_orig / 1024:.0f} KB -> {total_prep / 1024:.0f} KB "
+          f"(saved {saved / 1024:.0f} KB, {100 * saved / max(total_orig, 1):.1f}%)")
+    if upload:
+        print(f"Upload time: {total_orig_s:.2f} s -> {total_prep_s:.2f} s "
+              f"(saved {total_orig_s - total_prep_s:.2f} s)")
+    print(f"Stats: {get_image_prep_stats()}")
+
+
+if __name__ == "__main__":
+    main()
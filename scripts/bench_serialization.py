@@ -0,0 +1,148 @@
+# scripts/bench_serialization.py
+"""
+Compare JSON serialization paths on payloads shaped like the API's:
+
+  steps    — GET /api/manuals/{id}/steps for a 60-step manual
+  pages    — GET /api/manuals/{id}/pages, 40 pages with 400 boxes each
+             (suggested and final)
+  chat     — a procedural chat payload, plus 200 SSE frames of it
+
+Encoders:
+  json              stdlib json with Starlette's settings (previous behavior)
+  jsonable+json     FastAPI's default path: jsonable_encoder then json
+                    (only if fastapi is installed)
+  orjson            services/serialization.py's fast path (only if orjson is installed)
+
+Reports mean time per encode and throughput in MB/s.
+
+Usage:
+    python scripts/bench_serialization.py [iterations]
+"""
+import json
+import random
+import sys
+import time
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+try:
+    from fastapi.encoders import jsonable_encoder
+except Exception:
+    jsonable_encoder = None
+
+
+def _steps_payload() -> dict:
+    return {
+        "steps": [
+            {
+                "id": n,
+                "step_number": n,
+                "title": f"Step {n}",
+                "image_url": f"http://localhost:4000/manuals/1/step{n}.png",
+                "description": "Attach the side panel (B) to the base (A) using four cam bolts. " * 6,
+                "narration_url": f"http://localhost:4000/manuals/1/narration/step{n}.wav",
+                "orientation_narration_url": None,
+            }
+            for n in range(1, 61)
+        ]
+    }
+
+
+def _pages_payload() -> dict:
+    rng = random.Random(0)
+
+    def boxes():
+        return [
+            {"x": rng.randint(0, 2400), "y": rng.randint(0, 3300), "w": rng.randint(50, 900), "h": rng.randint(50, 900)}
+            for _ in range(400)
+        ]
+
+    return {
+        "pages": [
+            {
+                "page_number": n,
+                "image_url": f"http://localhost:4000/manuals/1/page_{n}.png",
+                "suggested_boxes": boxes(),
+                "final_boxes": boxes(),
+                "status": "CONFIRMED",
+            }
+            for n in range(1, 41)
+        ]
+    }
+
+
+def _chat_payload() -> dict:
+    return {
+        "payload": {
+            "type": "procedural",
+            "summary": "Line up the cam locks with the pre-drilled holes before tightening — café-style ✓.",
+            "steps": ["Insert the dowels into panel B.", "Seat panel B on the base.", "Turn each cam lock clockwise."],
+            "common_mistakes": ["Over-tightening the cam locks strips the particle board."],
+        },
+        "manual_id": 1,
+        "step_number": 4,
+    }
+
+
+def _encoders():
+    encoders = {
+        "json": lambda o: json.dumps(o, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8"),
+    }
+    if jsonable_encoder is not None:
+        encoders["jsonable+json"] = lambda o: encoders["json"](jsonable_encoder(o))
+    if orjson is not None:
+        encoders["orjson"] = lambda o: orjson.dumps(o, option=orjson.OPT_NON_STR_KEYS)
+    return encoders
+
+
+def _sse(encode):
+    chunk = {"event": "final", "payload": _chat_payload()["payload"]}
+
+    def run(_):
+        return b"".join(b"data: " + encode(chunk) + b"\n\n" for _ in range(200))
+
+    return run
+
+
+def _bench(fn, payload, iterations: int):
+    size = len(fn(payload))
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(payload)
+    elapsed = (time.perf_counter() - start) / iterations
+    return elapsed, size
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    encoders = _encoders()
+    cases = [
+        ("steps", _steps_payload()),
+        ("pages", _pages_payload()),
+        ("chat", _chat_payload()),
+    ]
+
+    for case, payload in cases:
+        print(f"{case}:")
+        baseline = None
+        for name, encode in encoders.items():
+            elapsed, size = _bench(encode, payload, iterations)
+            baseline = baseline or elapsed
+            print(
+                f"  {name:<14} {elapsed * 1000:8.3f} ms  {size / 1024:8.1f} KB  "
+                f"{size / elapsed / 1e6:8.1f} MB/s  x{baseline / elapsed:.1f}"
+            )
+
+    print("chat SSE (200 frames):")
+    baseline = None
+    for name, encode in encoders.items():
+        elapsed, size = _bench(_sse(encode), None, iterations)
+        baseline = baseline or elapsed
+        print(f"  {name:<14} {elapsed * 1000:8.3f} ms  {size / elapsed / 1e6:8.1f} MB/s  x{baseline / elapsed:.1f}")
+
+
+if __name__ == "__main__":
+    main()
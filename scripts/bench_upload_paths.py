@@ -0,0 +1,122 @@
+# scripts/bench_upload_paths.py
+"""
+Compare the server-side cost of the base64-in-JSON upload path
+(/api/lasso/upload, /api/transcribe) with the multipart variants
+(/api/lasso/upload-file, /api/transcribe/upload) at 1 MB and 10 MB.
+
+Each path runs the same service code as its endpoint:
+
+  lasso base64        LassoImageData from the JSON body, then
+                      services.lasso.save_lasso_screenshot()
+  lasso multipart     Starlette's SpooledTemporaryFile, then
+                      services.lasso.store_lasso_stream()
+  transcribe base64   services.transcription.transcribe_audio() on the JSON field
+  transcribe multipart  SpooledTemporaryFile, then transcribe_audio_file()
+
+Lasso crops are written to a temporary directory (LASSO_STORAGE_DIR is
+pointed there) and removed after each run so deduplication does not skip the
+write. The Whisper call is replaced by a reader that consumes the audio the
+way the Replicate client uploads it, so no network or model calls are made.
+
+Reports bytes on the wire, peak Python memory (tracemalloc) and median
+latency over several runs.
+
+Usage:
+    python scripts/bench_upload_paths.py
+"""
+import base64
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services import lasso, transcription  # noqa: E402
+
+CHUNK = 64 * 1024
+RUNS = 5
+SIZES = [1 * 1024 * 1024, 10 * 1024 * 1024]
+# Starlette spools multipart file parts in memory up to 1 MB, then on disk
+SPOOL_MAX_SIZE = 1024 * 1024
+
+
+def _read_upload(audio) -> dict:
+    """Stand-in for _run_whisper: read the file object as the upload would."""
+    for _ in iter(lambda: audio.read(CHUNK), b""):
+        pass
+    return {"text": ""}
+
+
+def _spool(body: bytes, out_dir: str):
+    incoming = io.BytesIO(body)
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, dir=out_dir)
+    for chunk in iter(lambda: incoming.read(CHUNK), b""):
+        spooled.write(chunk)
+    spooled.seek(0)
+    return spooled
+
+
+def lasso_base64(body: bytes, out_dir: str) -> None:
+    data = lasso.LassoImageData(**json.loads(body))
+    lasso.save_lasso_screenshot(data.image_data).unlink()
+
+
+def lasso_multipart(body: bytes, out_dir: str) -> None:
+    with _spool(body, out_dir) as spooled:
+        lasso.store_lasso_stream(spooled).unlink()
+
+
+def transcribe_base64(body: bytes, out_dir: str) -> None:
+    transcription.transcribe_audio(json.loads(body)["audio"])
+
+
+def transcribe_multipart(body: bytes, out_dir: str) -> None:
+    with _spool(body, out_dir) as spooled:
+        transcription.transcribe_audio_file(spooled, ".webm")
+
+
+def _measure(fn, body: bytes, out_dir: str):
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        fn(body, out_dir)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn(body, out_dir)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak
+
+
+def main():
+    transcription._run_whisper = _read_upload
+    with tempfile.TemporaryDirectory() as out_dir:
+        lasso.LASSO_STORAGE_DIR = Path(out_dir)
+        print(f"{'size':>6} {'path':<22} {'wire bytes':>12} {'peak mem':>10} {'median ms':>10}")
+        for size in SIZES:
+            # PNG signature so the stored crop gets its usual extension
+            payload = b"\x89PNG\r\n\x1a\n" + os.urandom(size - 8)
+            encoded = base64.b64encode(payload).decode()
+            lasso_body = json.dumps({"image_data": encoded, "step": 1, "manual_id": 1}).encode()
+            audio_body = json.dumps({"audio": f"data:audio/webm;base64,{encoded}"}).encode()
+
+            for label, fn, body in (
+                ("lasso base64", lasso_base64, lasso_body),
+                ("lasso multipart", lasso_multipart, payload),
+                ("transcribe base64", transcribe_base64, audio_body),
+                ("transcribe multipart", transcribe_multipart, payload),
+            ):
+                median, peak = _measure(fn, body, out_dir)
+                print(f"{size // (1024 * 1024):>4}MB {label:<22} {len(body):>12} "
+                      f"{peak / (1024 * 1024):>8.1f}MB {median * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
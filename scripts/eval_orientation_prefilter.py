@@ -0,0 +1,142 @@
+# scripts/eval_orientation_prefilter.py
+"""
+Compare the local orientation prefilter (services/orientation_prefilter.py)
+with the vision model on every consecutive step pair under public/manuals/.
+
+Ground truth is always the model called with the prefilter disabled.
+steps.orientation_text is not used: the batch precompute fills it through the
+prefilter, so those rows would score the prefilter against itself. With
+--live and REPLICATE_API_TOKEN set, transitions are sent to the model and the
+answers are kept in cache/orientation_eval.json, keyed by the content hashes
+of both images, so re-runs only pay for new or changed pairs. A reference
+call that fails (analyze_orientation_change returns None instead of a
+verdict) is neither cached nor scored; the pair is flagged and retried on the
+next --live run.
+
+Reports, per transition, the prefilter decision next to the model's
+show_popup, then the skip rate and how often skipped transitions disagree
+with the model. A "missed popup" (prefilter says unchanged, model shows a
+popup) is the costly error; tune MIN_INLIERS / ANGLE_TOLERANCE_DEG against it.
+
+Usage:
+    python scripts/eval_orientation_prefilter.py [--live] [manual_id ...]
+"""
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+load_dotenv()
+
+from services.manual_assets import MANUALS_DIR, discover_step_numbers, find_step_image  # noqa: E402
+from services.orientation_generator import analyze_orientation_change  # noqa: E402
+from services.orientation_prefilter import UNCERTAIN, UNCHANGED, classify_transition  # noqa: E402
+
+
+EVAL_CACHE_PATH = Path(__file__).resolve().parent.parent / "cache" / "orientation_eval.json"
+
+
+def _load_eval_cache() -> dict:
+    try:
+        return json.loads(EVAL_CACHE_PATH.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_eval_cache(cache: dict) -> None:
+    EVAL_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    EVAL_CACHE_PATH.write_text(json.dumps(cache, indent=2))
+
+
+def _pair_key(current_path: Path, next_path: Path) -> str:
+    digests = [hashlib.sha256(p.read_bytes()).hexdigest()[:16] for p in (current_path, next_path)]
+    return "-".join(digests)
+
+
+def _model_output(eval_cache: dict, current_path: Path, next_path: Path, live: bool):
+    """
+    The model's answer without the prefilter, from the eval cache or (with
+    --live) a fresh call. Returns (answer or None, whether a live call failed).
+    """
+    key = _pair_key(current_path, next_path)
+    value = eval_cache.get(key)
+    if value is None and live:
+        value = analyze_orientation_change(current_path, next_path, use_prefilter=False)
+        if value is None:
+            return None, True
+        eval_cache[key] = value
+    return value, False
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    live = "--live" in sys.argv and bool(os.getenv("REPLICATE_API_TOKEN"))
+    if args:
+        manual_ids = [int(a) for a in args]
+    else:
+        manual_ids = sorted(int(p.name) for p in MANUALS_DIR.iterdir() if p.is_dir() and p.name.isdigit())
+
+    eval_cache = _load_eval_cache()
+    total = skipped = compared = agree = missed_popups = failed = 0
+    prefilter_s = 0.0
+    for manual_id in manual_ids:
+        steps = discover_step_numbers(manual_id)
+        for from_step, to_step in zip(steps, steps[1:]):
+            current_path = find_step_image(manual_id, from_step)
+            next_path = find_step_image(manual_id, to_step)
+            start = time.perf_counter()
+            verdict = classify_transition(current_path, next_path)
+            prefilter_s += time.perf_counter() - start
+            total += 1
+
+            model, call_failed = _model_output(eval_cache, current_path, next_path, live)
+            model_popup = None if model is None else bool(model.get("show_popup"))
+            failed += call_failed
+
+            line = (
+                f"manual {manual_id} step {from_step}->{to_step}: {verdict['decision']:<9} "
+                f"({verdict['method'] or '-'}, {verdict['inliers']} inliers, {verdict['angle']}°) "
+                f"model={'-' if model_popup is None else ('popup' if model_popup else 'none')}"
+            )
+            if call_failed:
+                line += "  (model call failed, not scored)"
+            if verdict["decision"] != UNCERTAIN:
+                skipped += 1
+                if model_popup is not None:
+                    compared += 1
+                    if verdict["result"]["show_popup"] == model_popup:
+                        agree += 1
+                    else:
+                        line += "  <-- disagrees"
+                        if verdict["decision"] == UNCHANGED:
+                            missed_popups += 1
+            print(line)
+
+    if live:
+        _save_eval_cache(eval_cache)
+    if not total:
+        print("No step transitions found")
+        return
+    print(
+        f"\n{total} transition(s), prefilter decided {skipped} ({100 * skipped / total:.0f}% model calls skipped), "
+        f"{prefilter_s / total * 1000:.0f} ms average"
+    )
+    if failed:
+        print(f"{failed} reference model call(s) failed; those pairs are excluded and retried on the next --live run")
+    if compared:
+        print(
+            f"Agreement with model on decided transitions: {agree}/{compared} "
+            f"({100 * agree / compared:.0f}%), missed popups: {missed_popups}"
+        )
+    else:
+        print("No model outputs to compare against (pass --live with REPLICATE_API_TOKEN set)")
+
+
+if __name__ == "__main__":
+    main()
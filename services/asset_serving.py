@@ -0,0 +1,166 @@
+"""
+Large-asset file responses: HTTP Range and zero-copy transfer.
+
+Page renders, GLBs and cached audio are multi-megabyte, and Safari will not
+seek <audio> without 206 responses. RangeFileResponse (used by
+AssetStaticFiles for every file) adds:
+
+  - single byte ranges ("bytes=a-b", "bytes=a-", "bytes=-n") answered with
+    206 + Content-Range, 416 for unsatisfiable ranges, If-Range honoured;
+    multi-range requests get the full 200 response (allowed by RFC 9110)
+  - zero-copy transfer through the ASGI "http.response.zerocopysend"
+    extension (os.sendfile in the server) when the server offers it
+  - otherwise ASSET_CHUNK_SIZE reads in a worker thread (Starlette's path)
+
+Uvicorn does not implement zerocopysend. For kernel sendfile behind a reverse
+proxy, set SENDFILE_HEADER (e.g. X-Accel-Redirect for nginx) and
+SENDFILE_PREFIX to an internal proxy location aliased to the project root
+(nginx: location /internal/ { internal; alias /srv/app/; }). AssetStaticFiles
+then returns only that header and the proxy serves the file, ranges
+included, with sendfile.
+"""
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+ASSET_CHUNK_SIZE = 256 * 1024
+
+SENDFILE_HEADER = os.getenv("SENDFILE_HEADER", "")
+SENDFILE_PREFIX = os.getenv("SENDFILE_PREFIX", "/internal")
+
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+_stats = {"full": 0, "partial": 0, "unsatisfiable": 0, "zerocopy": 0, "read": 0}
+
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a Range header into an inclusive (start, end) byte range.
+    Returns None when the header should be ignored (malformed, multiple
+    ranges, non-byte units); raises RangeNotSatisfiable when no byte of the
+    range lies inside the file.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first == "":
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiable(header)
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start > end:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    return start, min(end, size - 1)
+
+
+class RangeFileResponse(FileResponse):
+    """FileResponse with single-range support and zero-copy transfer."""
+
+    chunk_size = ASSET_CHUNK_SIZE
+
+    def __init__(self, path, stat_result: os.stat_result, **kwargs):
+        super().__init__(path, stat_result=stat_result, **kwargs)
+        self.stat_result = stat_result
+        self.headers["accept-ranges"] = "bytes"
+
+    def _range_applies(self, request_headers: Headers) -> bool:
+        if_range = request_headers.get("if-range")
+        if not if_range:
+            return True
+        return if_range in (self.headers.get("etag"), self.headers.get("last-modified"))
+
+    async def __call__(self, scope, receive, send):
+        request_headers = Headers(scope=scope)
+        size = self.stat_result.st_size
+        start, end = 0, size - 1
+
+        range_header = request_headers.get("range")
+        if range_header and self.status_code == 200 and self._range_applies(request_headers):
+            try:
+                byte_range = parse_range(range_header, size)
+            except RangeNotSatisfiable:
+                _stats["unsatisfiable"] += 1
+                await send({
+                    "type": "http.response.start",
+                    "status": 416,
+                    "headers": [(b"content-range", f"bytes */{size}".encode()), (b"content-length", b"0")],
+                })
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+                return
+            if byte_range is not None:
+                start, end = byte_range
+                self.status_code = 206
+                self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+                self.headers["content-length"] = str(end - start + 1)
+        _stats["partial" if self.status_code == 206 else "full"] += 1
+
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD" or size == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+            await self._send_zerocopy(send, start, end)
+        else:
+            await self._send_read(send, start, end)
+        if self.background is not None:
+            await self.background()
+
+    async def _send_zerocopy(self, send, start: int, end: int) -> None:
+        _stats["zerocopy"] += 1
+        with open(self.path, "rb") as f:
+            await send({
+                "type": ZEROCOPY_EXTENSION,
+                "file": f,
+                "offset": start,
+                "count": end - start + 1,
+                "more_body": False,
+            })
+
+    async def _send_read(self, send, start: int, end: int) -> None:
+        _stats["read"] += 1
+        remaining = end - start + 1
+        async with await anyio.open_file(self.path, mode="rb") as f:
+            if start:
+                await f.seek(start)
+            while remaining > 0:
+                chunk = await f.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # File shrank while sending; close the body so the client sees a short response
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def sendfile_enabled() -> bool:
+    return bool(SENDFILE_HEADER)
+
+
+def sendfile_location(full_path) -> str:
+    """Internal proxy location for a file (e.g. /internal/public/manuals/1/step1.glb)."""
+    relative = Path(os.path.realpath(full_path)).relative_to(BASE_DIR)
+    return f"{SENDFILE_PREFIX.rstrip('/')}/{relative.as_posix()}"
+
+
+def get_asset_serving_stats() -> dict:
+    return dict(_stats)
@@ -0,0 +1,132 @@
+"""
+Local audio preprocessing for speech transcription.
+
+Whisper works on 16 kHz mono audio, so anything richer is wasted upload
+bandwidth. For WAV input, prepare_wav_for_whisper() decodes the PCM data,
+downmixes to mono, resamples to 16 kHz, trims leading/trailing silence and
+re-encodes 16-bit PCM — typically a 3–6x smaller upload for browser recordings
+at 44.1/48 kHz stereo.
+
+Compressed formats (webm/opus, mp3, ogg) cannot be decoded without ffmpeg and
+are already compact, so they are passed through unchanged.
+
+Uses numpy (installed with opencv-python); if it is unavailable every helper
+degrades to a pass-through.
+"""
+import io
+import wave
+from typing import Optional, Tuple
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+WHISPER_SAMPLE_RATE = 16000
+FRAME_MS = 20
+# Frames quieter than this fraction of the loudest frame count as silence
+SILENCE_RATIO = 0.05
+# Absolute floor (full scale = 1.0) so near-silent clips are not "amplified" into speech
+SILENCE_FLOOR = 0.005
+# Keep this much audio around detected speech
+TRIM_PADDING_MS = 200
+
+
+def is_wav(data: bytes) -> bool:
+    return data[:4] == b"RIFF" and data[8:12] == b"WAVE"
+
+
+def decode_wav(data: bytes) -> Optional[Tuple["np.ndarray", int]]:
+    """Decode PCM WAV bytes into (mono float32 samples in [-1, 1], sample rate)."""
+    if np is None:
+        return None
+    try:
+        with wave.open(io.BytesIO(data), "rb") as w:
+            channels, width, rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+            frames = w.readframes(w.getnframes())
+    except (wave.Error, EOFError):
+        return None
+
+    if width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 4:
+        samples = np.frombuffer(frames, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        return None
+
+    if channels > 1:
+        samples = samples[: len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+    return samples, rate
+
+
+def pcm16_to_float(data: bytes) -> "np.ndarray":
+    """Convert raw little-endian 16-bit mono PCM to float32 samples."""
+    return np.frombuffer(data[: len(data) - len(data) % 2], dtype="<i2").astype(np.float32) / 32768.0
+
+
+def resample(samples: "np.ndarray", rate: int, target_rate: int = WHISPER_SAMPLE_RATE) -> "np.ndarray":
+    """Linear-interpolation resample (adequate for speech recognition input)."""
+    if rate == target_rate or len(samples) == 0:
+        return samples
+    duration = len(samples) / rate
+    target_len = max(1, int(round(duration * target_rate)))
+    src_t = np.arange(len(samples)) / rate
+    dst_t = np.arange(target_len) / target_rate
+    return np.interp(dst_t, src_t, samples).astype(np.float32)
+
+
+def frame_rms(samples: "np.ndarray", rate: int, frame_ms: int = FRAME_MS) -> "np.ndarray":
+    """Root-mean-square energy of consecutive non-overlapping frames."""
+    frame_len = max(1, rate * frame_ms // 1000)
+    n_frames = len(samples) // frame_len
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = samples[: n_frames * frame_len].reshape(n_frames, frame_len)
+    return np.sqrt(np.mean(frames ** 2, axis=1))
+
+
+def silence_threshold(rms: "np.ndarray") -> float:
+    if len(rms) == 0:
+        return SILENCE_FLOOR
+    return max(float(rms.max()) * SILENCE_RATIO, SILENCE_FLOOR)
+
+
+def trim_silence(samples: "np.ndarray", rate: int) -> "np.ndarray":
+    """Drop leading and trailing silence, keeping TRIM_PADDING_MS around speech."""
+    rms = frame_rms(samples, rate)
+    voiced = np.nonzero(rms > silence_threshold(rms))[0]
+    if len(voiced) == 0:
+        return samples
+    frame_len = max(1, rate * FRAME_MS // 1000)
+    pad = rate * TRIM_PADDING_MS // 1000
+    start = max(0, voiced[0] * frame_len - pad)
+    end = min(len(samples), (voiced[-1] + 1) * frame_len + pad)
+    return samples[start:end]
+
+
+def encode_wav(samples: "np.ndarray", rate: int) -> bytes:
+    """Encode float samples as 16-bit mono PCM WAV bytes."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+def prepare_wav_for_whisper(data: bytes) -> bytes:
+    """
+    Downmix, resample to 16 kHz and trim silence from WAV bytes. Returns the
+    input unchanged if it is not decodable PCM WAV or the result is not smaller.
+    """
+    decoded = decode_wav(data) if is_wav(data) else None
+    if decoded is None:
+        return data
+    samples, rate = decoded
+    samples = trim_silence(resample(samples, rate), WHISPER_SAMPLE_RATE)
+    prepared = encode_wav(samples, WHISPER_SAMPLE_RATE)
+    return prepared if len(prepared) < len(data) else data
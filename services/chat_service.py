@@ -23,7 +23,10 @@ from typing import Any, Optional
 from dotenv import load_dotenv
 import replicate
 
-from .text_extraction import get_step_explanation, discover_step_numbers
+from .text_extraction import get_step_explanation
+from .manual_assets import STEP_IMAGE_PATTERN, discover_step_numbers, get_step_asset
+from .replicate_files import vision_input
+from .metrics import track_replicate
 
 load_dotenv()
 
@@ -201,11 +204,14 @@ def _prepare_image_input(
     """
     Build Replicate `image_input`.
 
+    Local step and lasso images are resolved to upload-once file references
+    (see replicate_files.py); file handles are only opened as a fallback.
+
     Returns:
       (image_inputs, opened_files_to_close)
     """
 
-    def resolve_to_file(url: str) -> Optional[object]:
+    def resolve_to_input(url: str) -> Optional[object]:
         if not url:
             return None
         try:
@@ -213,15 +219,21 @@ def _prepare_image_input(
             parsed = urlparse(url)
             path_parts = parsed.path.strip("/").split("/")
             base_dir = Path(__file__).resolve().parent.parent
+            step_match = STEP_IMAGE_PATTERN.match(path_parts[-1])
+            if path_parts[0] == "manuals" and len(path_parts) == 3 and path_parts[1].isdigit() and step_match:
+                # /manuals/{id}/stepN.png -> indexed step image (no filesystem probe)
+                asset = get_step_asset(int(path_parts[1]), int(step_match.group(1)))
+                if asset and asset["path"].name == path_parts[-1]:
+                    return vision_input(asset["path"])
             if path_parts[0] == "manuals" and len(path_parts) >= 3:
-                # /manuals/{id}/stepN.png -> public/manuals/{id}/stepN.png
+                # /manuals/{id}/<file> -> public/manuals/{id}/<file>
                 file_path = base_dir / "public" / "manuals" / path_parts[1] / path_parts[-1]
             elif path_parts[0] == "lasso_screenshots":
                 file_path = base_dir / "lasso_screenshots" / path_parts[-1]
             else:
                 return None
             if file_path.exists():
-                return open(file_path, "rb")
+                return vision_input(file_path)
             return None
         except Exception as e:
             print(f"Error resolving URL {url}: {e}")
@@ -232,10 +244,11 @@ def _prepare_image_input(
     for url in [image_url, secondary_image_url]:
         if not url:
             continue
-        file_obj = resolve_to_file(url)
-        if file_obj:
-            image_inputs.append(file_obj)
-            opened_files.append(file_obj)
+        resolved = resolve_to_input(url)
+        if resolved:
+            image_inputs.append(resolved)
+            if hasattr(resolved, "close"):
+                opened_files.append(resolved)
         elif "localhost" not in url and "127.0.0.1" not in url:
             # Fallback to URL if it's not a localhost URL (e.g. external)
             image_inputs.append(url)
@@ -243,14 +256,28 @@ def _prepare_image_input(
     return image_inputs, opened_files
 
 
+def warm_image_inputs(image_url: Optional[str], secondary_image_url: Optional[str]) -> None:
+    """
+    Resolve chat images ahead of time so their upload-once file references are
+    cached before the chat call needs them.
+    """
+    _, opened_files = _prepare_image_input(image_url, secondary_image_url)
+    for img in opened_files:
+        try:
+            img.close()
+        except Exception:
+            pass
+
+
 def _call_replicate_text(system_prompt: str, prompt: str, images: list[Any]) -> str:
     input_data: dict[str, Any] = {"prompt": prompt, "system_prompt": system_prompt}
     if images:
         input_data["image_input"] = images
 
     response_parts: list[str] = []
-    for event in replicate.stream(MODEL, input=input_data):
-        response_parts.append(str(event))
+    with track_replicate("chat", MODEL):
+        for event in replicate.stream(MODEL, input=input_data):
+            response_parts.append(str(event))
     return "".join(response_parts)
 
 
@@ -0,0 +1,188 @@
+"""
+Response compression middleware (gzip, and brotli when installed).
+
+A pure ASGI middleware rather than Starlette's GZipMiddleware so it can:
+  - negotiate brotli ("br") when the brotli module is available, else gzip,
+    honouring q-values in Accept-Encoding
+  - leave text/event-stream alone: compressing SSE would buffer events in
+    the compressor and delay every chat/TTS/voice chunk
+  - only compress text-like types (JSON, HTML, JS, CSS, SVG, glTF JSON);
+    PNG/WebP/GLB/WAV are already compressed or do not benefit
+  - turn a strong ETag into a weak one on the compressed representation, so
+    If-None-Match still matches (weak comparison) but caches never confuse
+    the encoded bytes with the identity ones
+
+Responses smaller than COMPRESS_MIN_BYTES, partial (206) and bodiless
+responses, and anything that already has a Content-Encoding pass through
+unchanged. Set COMPRESSION=0 to disable.
+"""
+import os
+import zlib
+from typing import List, Optional, Tuple
+
+try:
+    import brotli
+except Exception:
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "500"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "model/gltf+json",
+    "image/svg+xml",
+    "text/",
+)
+EXCLUDED_TYPES = ("text/event-stream",)
+
+
+def compression_enabled() -> bool:
+    return os.getenv("COMPRESSION", "1") == "1"
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick "br" or "gzip" from an Accept-Encoding header value (None for identity)."""
+    weights = {}
+    for part in accept_encoding.split(","):
+        fields = part.strip().split(";")
+        coding = fields[0].strip().lower()
+        q = 1.0
+        for param in fields[1:]:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            weights[coding] = q
+    star = weights.get("*", 0.0)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best = max(candidates, key=lambda c: weights.get(c, star))
+    return best if weights.get(best, star) > 0 else None
+
+
+def _is_compressible(content_type: str) -> bool:
+    content_type = content_type.lower()
+    if content_type.startswith(EXCLUDED_TYPES):
+        return False
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._brotli.process(data) if self._brotli else self._zlib.compress(data)
+
+    def finish(self) -> bytes:
+        return self._brotli.finish() if self._brotli else self._zlib.flush()
+
+
+class CompressionMiddleware:
+    """Compress text-like HTTP responses according to Accept-Encoding."""
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not compression_enabled():
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = negotiate_encoding(accept) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[dict] = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                if start_message is not None and compressor is None and not passthrough:
+                    # Extension messages (e.g. http.response.zerocopysend) carry the
+                    # body themselves: send the held start uncompressed first
+                    passthrough = True
+                    headers = list(start_message.get("headers", []))
+                    content_type = dict((k.lower(), v) for k, v in headers).get(b"content-type", b"")
+                    if _is_compressible(content_type.decode("latin-1")):
+                        headers = _add_vary(headers)
+                    await send({**start_message, "headers": headers})
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None and not passthrough:
+                headers: List[Tuple[bytes, bytes]] = list(start_message.get("headers", []))
+                lookup = {k.lower(): v for k, v in headers}
+                content_type = lookup.get(b"content-type", b"").decode("latin-1")
+                status = start_message["status"]
+                compressible = _is_compressible(content_type)
+                if compressible:
+                    headers = _add_vary(headers)
+                if (
+                    not compressible
+                    or b"content-encoding" in lookup
+                    or not (200 <= status < 300)
+                    or status in (204, 206)
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send({**start_message, "headers": headers})
+                else:
+                    compressor = _Compressor(encoding)
+                    headers = [
+                        (k, _weak_etag(v) if k.lower() == b"etag" else v)
+                        for k, v in headers
+                        if k.lower() != b"content-length"
+                    ]
+                    headers.append((b"content-encoding", encoding.encode()))
+                    await send({**start_message, "headers": headers})
+
+            if passthrough:
+                await send(message)
+                return
+
+            data = compressor.compress(body)
+            if not more_body:
+                data += compressor.finish()
+            if data or not more_body:
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def _add_vary(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    for i, (name, value) in enumerate(headers):
+        if name.lower() == b"vary":
+            if b"accept-encoding" not in value.lower():
+                headers[i] = (name, value + b", Accept-Encoding")
+            return headers
+    return headers + [(b"vary", b"Accept-Encoding")]
+
+
+def _weak_etag(value: bytes) -> bytes:
+    return value if value.startswith(b"W/") else b"W/" + value
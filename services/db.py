@@ -10,11 +10,13 @@ Tables managed here:
   manuals  — manual metadata
   steps    — per-step data with AI-generated caches (description, orientation_text)
   pages    — per-page data used during PDF ingestion (suggested/confirmed boxes)
+  lasso_analyses — memoized lasso crop analyses keyed by perceptual hash
 """
 import os
 from dotenv import load_dotenv
-from typing import List, Optional
+from typing import Dict, List, Optional
 from .db_columns import StepColumn
+from .metrics import timed_db
 
 parent_env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
 load_dotenv(parent_env_path)
@@ -27,52 +29,21 @@ except Exception:
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-# NOTE: _dbg_log and its call sites below are leftover development instrumentation.
-# They write to a hardcoded local path and have no effect in other environments
-# (all calls are wrapped in try/except). Remove before production deployment.
-import json as _dbg_json
-def _dbg_log(hyp, msg, data):
-    try:
-        import time
-        with open("/Users/aaronzhang/Desktop/wayfair_studio_backend/.cursor/debug.log", "a") as f:
-            safe_data = {k: (v[:20] + "..." if isinstance(v, str) and len(v) > 30 else v) for k, v in data.items()}
-            f.write(_dbg_json.dumps({"hypothesisId": hyp, "location": "db.py", "message": msg, "data": safe_data, "timestamp": int(time.time() * 1000)}) + "\n")
-    except: pass
+
+def db_configured() -> bool:
+    """True if DATABASE_URL is set and psycopg2 is importable (writes will not no-op)."""
+    return bool(DATABASE_URL) and psycopg2 is not None
+
 
 def _get_connection():
-    # region agent log
-    _dbg_log("A,B,E", "DATABASE_URL value check", {"url_set": DATABASE_URL is not None, "url_prefix": DATABASE_URL[:40] if DATABASE_URL else "None", "env_file_path": parent_env_path, "env_file_exists": os.path.exists(parent_env_path)})
-    # Parse URL to check password details (not the actual password)
-    if DATABASE_URL and "://" in DATABASE_URL:
-        try:
-            creds_part = DATABASE_URL.split("://")[1].split("@")[0]  # user:pass
-            if ":" in creds_part:
-                user, pwd = creds_part.split(":", 1)
-                _dbg_log("B", "URL credentials check", {"user": user, "pwd_len": len(pwd), "pwd_starts": pwd[:2] if pwd else "", "pwd_ends": pwd[-2:] if len(pwd) >= 2 else ""})
-            else:
-                _dbg_log("B", "URL has no password separator", {"creds_part": creds_part})
-        except: pass
-    # #endregion
     if not DATABASE_URL:
         raise RuntimeError("DATABASE_URL not set")
     if psycopg2 is None:
         raise RuntimeError("psycopg2 not installed")
-    # #region agent log
-    _dbg_log("C,D", "Attempting psycopg2.connect", {"url_host_part": DATABASE_URL.split("@")[-1] if "@" in DATABASE_URL else "no_at_sign"})
-    # #endregion
-    try:
-        conn = psycopg2.connect(DATABASE_URL)
-        # #region agent log
-        _dbg_log("ALL", "Connection successful", {"status": "ok"})
-        # #endregion
-        return conn
-    except Exception as e:
-        # #region agent log
-        _dbg_log("ALL", "Connection failed", {"error_type": type(e).__name__, "error_msg": str(e)[:100]})
-        # #endregion
-        raise
+    return psycopg2.connect(DATABASE_URL)
 
 
+@timed_db(enabled=db_configured)
 def _ensure_table_exists():
     try:
         conn = _get_connection()
@@ -121,9 +92,25 @@ def _ensure_table_exists():
                 )
                 """
             )
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS lasso_analyses (
+                    id SERIAL PRIMARY KEY,
+                    manual_id INTEGER NOT NULL,
+                    step_number INTEGER NOT NULL,
+                    phash TEXT NOT NULL,
+                    aspect REAL NOT NULL,
+                    summary TEXT NOT NULL,
+                    questions JSONB NOT NULL,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    UNIQUE(manual_id, step_number, phash)
+                )
+                """
+            )
             cur.execute("ALTER TABLE steps ADD COLUMN IF NOT EXISTS orientation_text JSONB")
 
 
+@timed_db(enabled=db_configured)
 def get_cached_value(manual_id: int, step_number: int, column: StepColumn, returnMetadata: bool = True) -> Optional[dict]:
     """Fetch any column for a given manual and step"""
     try:
@@ -149,6 +136,7 @@ def get_cached_value(manual_id: int, step_number: int, column: StepColumn, retur
     return None
 
 
+@timed_db(enabled=db_configured)
 def store_value(manual_id: int, step_number: int, column: StepColumn, value: str) -> None:
     """Insert or update a value into the DB. Safely no-ops if DB not configured."""
     try:
@@ -168,6 +156,28 @@ def store_value(manual_id: int, step_number: int, column: StepColumn, value: str
             cur.execute(query, (value, manual_id, step_number))
 
 
+@timed_db(enabled=db_configured)
+def get_column_for_manual(manual_id: int, column: StepColumn) -> Dict[int, object]:
+    """Return {step_number: value} for every step of a manual where the column is set."""
+    try:
+        conn = _get_connection()
+    except RuntimeError:
+        return {}
+
+    column_name = column.value
+
+    with conn:
+        with conn.cursor() as cur:
+            query = f"""
+                SELECT step_number, {column_name}
+                FROM steps
+                WHERE manual_id = %s AND {column_name} IS NOT NULL
+                """
+            cur.execute(query, (manual_id,))
+            return {row[0]: row[1] for row in cur.fetchall()}
+
+
+@timed_db(enabled=db_configured)
 def ensure_manual_and_step(
     manual_id: int,
     step_number: int,
@@ -206,6 +216,7 @@ def ensure_manual_and_step(
             )
 
 
+@timed_db(enabled=db_configured)
 def get_product_image_url(manual_id: int) -> Optional[str]:
     """Get the colored product reference image URL for a manual."""
     try:
@@ -226,6 +237,7 @@ def get_product_image_url(manual_id: int) -> Optional[str]:
     return None
 
 
+@timed_db(enabled=db_configured)
 def get_manuals() -> List[dict]:
     """Return all manuals with id, name, and slug for the list endpoint."""
     try:
@@ -240,6 +252,7 @@ def get_manuals() -> List[dict]:
             return [dict(r) for r in rows]
 
 
+@timed_db(enabled=db_configured)
 def get_manual(manual_id: int) -> Optional[dict]:
     """Return a single manual by id, or None if not found."""
     try:
@@ -257,6 +270,7 @@ def get_manual(manual_id: int) -> Optional[dict]:
             return dict(row) if row else None
 
 
+@timed_db(enabled=db_configured)
 def get_steps_for_manual(manual_id: int) -> List[dict]:
     """Return all steps for a manual (step_number, image_url, description), ordered by step_number."""
     try:
@@ -278,6 +292,7 @@ def get_steps_for_manual(manual_id: int) -> List[dict]:
             rows = cur.fetchall()
             return [dict(r) for r in rows]
 
+@timed_db(enabled=db_configured)
 def get_pages_for_manual(manual_id: int) -> List[dict]:
     """Return all pages for a manual (page_number, image_url, boxes), ordered by page_number."""
     try:
@@ -299,6 +314,7 @@ def get_pages_for_manual(manual_id: int) -> List[dict]:
             rows = cur.fetchall()
             return [dict(r) for r in rows]
         
+@timed_db(enabled=db_configured)
 def update_page_boxes(manual_id: int, page_number: int, boxes: list) -> None:
     """Update bounding boxes for a specific manual page."""
     try:
@@ -316,3 +332,54 @@ def update_page_boxes(manual_id: int, page_number: int, boxes: list) -> None:
                 """,
                 (psycopg2.extras.Json(boxes), manual_id, page_number),
             )
+
+
+@timed_db(enabled=db_configured)
+def get_lasso_analyses(manual_id: int, step_number: int) -> List[dict]:
+    """Return memoized lasso analyses (phash, aspect, summary, questions) for a step."""
+    try:
+        conn = _get_connection()
+    except RuntimeError:
+        return []
+
+    with conn:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(
+                """
+                SELECT phash, aspect, summary, questions
+                FROM lasso_analyses
+                WHERE manual_id = %s AND step_number = %s
+                ORDER BY created_at DESC
+                """,
+                (manual_id, step_number),
+            )
+            rows = cur.fetchall()
+            return [dict(r) for r in rows]
+
+
+@timed_db(enabled=db_configured)
+def store_lasso_analysis(
+    manual_id: int,
+    step_number: int,
+    phash: str,
+    aspect: float,
+    summary: str,
+    questions: list,
+) -> None:
+    """Persist a lasso analysis for reuse across restarts. No-op if DB not configured."""
+    try:
+        conn = _get_connection()
+    except RuntimeError:
+        return
+
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO lasso_analyses (manual_id, step_number, phash, aspect, summary, questions)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON CONFLICT (manual_id, step_number, phash) DO UPDATE
+                SET summary = EXCLUDED.summary, questions = EXCLUDED.questions, aspect = EXCLUDED.aspect
+                """,
+                (manual_id, step_number, phash, aspect, summary, psycopg2.extras.Json(questions)),
+            )
@@ -0,0 +1,219 @@
+"""
+GLB model optimization and LOD delivery for the spatial viewer.
+
+Step models (public/manuals/<id>/stepN.glb) are exported straight from the
+modelling tool and were downloaded in full on every view. build_step_lods()
+runs gltfpack (https://meshoptimizer.org/gltf/) on a model once per content
+change and writes one file per level of GLB_LOD_RATIOS into
+public/manuals/<id>/lod/:
+
+  step{N}_lod0.glb   full detail      quantized + meshopt-compressed
+  step{N}_lod1.glb   50% triangles    simplified, quantized, compressed
+  step{N}_lod2.glb   20% triangles    ...
+
+gltfpack quantizes vertex attributes by default; -cc adds
+EXT_meshopt_compression (decoded in the viewer by three.js MeshoptDecoder).
+A step{N}.json manifest records the source's content hash, so LODs are
+rebuilt only when the source model changes. A failed build is recorded in the
+manifest too, and is not retried until the source changes (or the model is
+uploaded again). Builds run only on upload and in the startup/segmentation
+preload (build_manual_lods), never inside a GET.
+
+get_step_lods() only reads: it returns the built levels with ?v=<content
+hash> URLs, which the /manuals mount (services/static_assets.py) serves as
+immutable, or the original model as the only level when there are no LODs
+for the current source (not built yet, build failed, or no gltfpack).
+"""
+import json
+import os
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional
+
+from .manual_assets import MANUALS_DIR
+from .static_assets import asset_version, content_digest, versioned_url
+
+GLTFPACK_PATH = os.getenv("GLTFPACK_PATH", "gltfpack")
+GLB_LOD_RATIOS = tuple(float(r) for r in os.getenv("GLB_LOD_RATIOS", "1.0,0.5,0.2").split(","))
+GLTFPACK_TIMEOUT = 300
+GLB_MAX_UPLOAD_BYTES = int(os.getenv("GLB_MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+
+GLB_MAGIC = b"glTF"
+LOD_DIRNAME = "lod"
+
+_build_locks: Dict[str, threading.Lock] = {}
+_locks_lock = threading.Lock()
+
+_stats = {"builds": 0, "hits": 0, "failures": 0}
+
+
+def gltfpack_binary() -> Optional[str]:
+    return shutil.which(GLTFPACK_PATH)
+
+
+def step_model_path(manual_id: int, step_number: int) -> Path:
+    return MANUALS_DIR / str(manual_id) / f"step{step_number}.glb"
+
+
+def _lod_dir(manual_id: int) -> Path:
+    return MANUALS_DIR / str(manual_id) / LOD_DIRNAME
+
+
+def _manifest_path(manual_id: int, step_number: int) -> Path:
+    return _lod_dir(manual_id) / f"step{step_number}.json"
+
+
+def _base_url() -> str:
+    return os.getenv("APP_URL", "http://localhost:4000").rstrip("/")
+
+
+def store_step_model(manual_id: int, step_number: int, stream: BinaryIO) -> Path:
+    """
+    Write an uploaded GLB to public/manuals/<id>/stepN.glb (atomically).
+    Raises ValueError if the upload is not a binary glTF or is too large.
+    """
+    dest = step_model_path(manual_id, step_number)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    header = stream.read(12)
+    if len(header) < 12 or header[:4] != GLB_MAGIC:
+        raise ValueError("Upload is not a binary glTF (.glb) file")
+    tmp = dest.with_name(f"{dest.name}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(header)
+            written = len(header)
+            for chunk in iter(lambda: stream.read(1024 * 1024), b""):
+                written += len(chunk)
+                if written > GLB_MAX_UPLOAD_BYTES:
+                    raise ValueError(f"Model exceeds {GLB_MAX_UPLOAD_BYTES} bytes")
+                f.write(chunk)
+        os.replace(tmp, dest)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return dest
+
+
+def _read_manifest(manual_id: int, step_number: int) -> Optional[dict]:
+    try:
+        return json.loads(_manifest_path(manual_id, step_number).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(manual_id: int, step_number: int, manifest: dict) -> None:
+    manifest_path = _manifest_path(manual_id, step_number)
+    tmp = manifest_path.with_name(manifest_path.name + ".tmp")
+    tmp.write_text(json.dumps(manifest))
+    os.replace(tmp, manifest_path)
+
+
+def _run_gltfpack(binary: str, source: Path, dest: Path, ratio: float) -> None:
+    args = [binary, "-i", str(source), "-o", str(dest), "-cc"]
+    if ratio < 1.0:
+        args += ["-si", str(ratio)]
+    result = subprocess.run(args, capture_output=True, text=True, timeout=GLTFPACK_TIMEOUT)
+    if result.returncode != 0:
+        raise RuntimeError(f"gltfpack failed ({result.returncode}): {result.stderr.strip()[:500]}")
+
+
+def build_step_lods(manual_id: int, step_number: int, force: bool = False) -> Optional[dict]:
+    """
+    Build the LOD files for a step model if the source changed since the last
+    build attempt. Returns the manifest, or None when the step has no model,
+    gltfpack is unavailable, or building this source failed (now or before;
+    `force` retries it).
+    """
+    source = step_model_path(manual_id, step_number)
+    if not source.exists():
+        return None
+    binary = gltfpack_binary()
+    if binary is None:
+        return None
+    source_digest = content_digest(source)
+
+    key = f"{manual_id}:{step_number}"
+    with _locks_lock:
+        lock = _build_locks.setdefault(key, threading.Lock())
+    with lock:
+        manifest = _read_manifest(manual_id, step_number)
+        if not force and manifest and manifest.get("source_digest") == source_digest:
+            if manifest.get("error"):
+                return None
+            _stats["hits"] += 1
+            return manifest
+
+        lod_dir = _lod_dir(manual_id)
+        lod_dir.mkdir(parents=True, exist_ok=True)
+        levels = []
+        try:
+            for level, ratio in enumerate(GLB_LOD_RATIOS):
+                dest = lod_dir / f"step{step_number}_lod{level}.glb"
+                tmp = dest.with_name(f"{dest.stem}.{threading.get_ident()}.tmp.glb")
+                try:
+                    _run_gltfpack(binary, source, tmp, ratio)
+                    os.replace(tmp, dest)
+                finally:
+                    tmp.unlink(missing_ok=True)
+                levels.append({"level": level, "ratio": ratio, "file": dest.name, "size": dest.stat().st_size})
+        except Exception as e:
+            _stats["failures"] += 1
+            print(f"[GLB] Manual {manual_id} step {step_number}: {e}")
+            # Remember the failure so this source is not handed to gltfpack again
+            _write_manifest(manual_id, step_number, {"source_digest": source_digest, "error": str(e)[:500]})
+            return None
+
+        manifest = {"source_digest": source_digest, "source_size": source.stat().st_size, "levels": levels}
+        _write_manifest(manual_id, step_number, manifest)
+        _stats["builds"] += 1
+        sizes = ", ".join(f"lod{l['level']}={l['size']}" for l in levels)
+        print(f"[GLB] Manual {manual_id} step {step_number}: {manifest['source_size']} bytes -> {sizes}")
+        return manifest
+
+
+def get_step_lods(manual_id: int, step_number: int) -> Optional[List[dict]]:
+    """
+    Return the available levels for a step model, most detailed first:
+    [{"level", "ratio", "url", "size", "compressed"}]. Falls back to the
+    uncompressed original as level 0. None if the step has no model.
+    Never runs gltfpack; see build_step_lods().
+    """
+    source = step_model_path(manual_id, step_number)
+    if not source.exists():
+        return None
+    manifest = _read_manifest(manual_id, step_number)
+    if not manifest or manifest.get("error") or manifest.get("source_digest") != content_digest(source):
+        url = f"{_base_url()}/manuals/{manual_id}/{source.name}?v={asset_version(source)}"
+        return [{"level": 0, "ratio": 1.0, "url": url, "size": source.stat().st_size, "compressed": False}]
+
+    lod_dir = _lod_dir(manual_id)
+    levels = []
+    for entry in manifest["levels"]:
+        path = lod_dir / entry["file"]
+        url = versioned_url(f"{_base_url()}/manuals/{manual_id}/{LOD_DIRNAME}/{entry['file']}", path)
+        levels.append({
+            "level": entry["level"],
+            "ratio": entry["ratio"],
+            "url": url,
+            "size": entry["size"],
+            "compressed": True,
+        })
+    return levels
+
+
+def build_manual_lods(manual_id: int) -> int:
+    """Build LODs for every stepN.glb in a manual. Returns the number of models with LODs."""
+    if gltfpack_binary() is None:
+        return 0
+    manual_dir = MANUALS_DIR / str(manual_id)
+    built = 0
+    for path in sorted(manual_dir.glob("step*.glb")):
+        step = path.stem[len("step"):]
+        if step.isdigit() and build_step_lods(manual_id, int(step)) is not None:
+            built += 1
+    return built
+
+
+def get_glb_pipeline_stats() -> dict:
+    return dict(_stats, gltfpack=gltfpack_binary() is not None)
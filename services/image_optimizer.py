@@ -0,0 +1,151 @@
+"""
+Ingestion-time storage optimization for manual images.
+
+segment_manual_into_steps() writes step crops with cv2.imwrite's default PNG
+settings and ingest_pdf_pages() keeps every 300 DPI page render as PNG. Both
+are stored and served as written. optimize_manual_images() runs after
+segmentation:
+
+  1. Step crops that look like line art (few distinct colors) are palette
+     quantized to QUANTIZE_COLORS colors without dithering — assembly
+     diagrams are black strokes on white, so this is visually lossless and
+     typically 2–4x smaller. Other images are re-compressed losslessly.
+     A result is only kept when it is smaller than the original.
+  2. With INGEST_WEBP_SIBLINGS=1, a stepN.webp sibling is written next to
+     each crop (lossless for line art).
+  3. With KEEP_PAGE_IMAGES=0, the intermediate page_N.png renders are
+     deleted once steps exist. They are kept by default: the pages listing
+     links them and re-running segmentation with new boxes needs them.
+
+Page renders themselves are saved with optimize=True during ingestion.
+The report (bytes before/after, pages removed) is returned by the
+confirm-segmentation endpoint. Requires Pillow; without it nothing changes.
+"""
+import os
+from pathlib import Path
+from typing import Tuple
+
+from . import manual_assets
+from .image_prep import Image
+from .steps_listing import invalidate_steps_listing
+
+MANUALS_DIR = manual_assets.MANUALS_DIR
+
+QUANTIZE_COLORS = int(os.getenv("QUANTIZE_COLORS", "64"))
+# An image with at most this many distinct colors (on a thumbnail) is line art;
+# equal to the palette size so shaded images are never quantized without dithering
+LINE_ART_MAX_COLORS = QUANTIZE_COLORS
+LINE_ART_SAMPLE_SIZE = (256, 256)
+WEBP_QUALITY = 85
+
+
+def keep_page_images() -> bool:
+    return os.getenv("KEEP_PAGE_IMAGES", "1") == "1"
+
+
+def webp_siblings_enabled() -> bool:
+    return os.getenv("INGEST_WEBP_SIBLINGS", "0") == "1"
+
+
+def is_line_art(img) -> bool:
+    """True if a downsampled copy of the image has few distinct colors."""
+    sample = img.convert("RGB")
+    sample.thumbnail(LINE_ART_SAMPLE_SIZE)
+    return sample.getcolors(maxcolors=LINE_ART_MAX_COLORS) is not None
+
+
+def _quantize(img):
+    dither = getattr(Image, "Dither", Image).NONE
+    method = getattr(Image, "Quantize", Image).FASTOCTREE
+    return img.convert("RGB").quantize(colors=QUANTIZE_COLORS, method=method, dither=dither)
+
+
+def optimize_png(path: Path, quantize: bool = True) -> Tuple[int, int]:
+    """
+    Rewrite a PNG in place with palette quantization (line art only, when
+    `quantize`) or lossless re-compression. Returns (bytes before, bytes after).
+    """
+    before = path.stat().st_size
+    if Image is None:
+        return before, before
+    tmp = path.with_name(path.name + ".opt.tmp")
+    try:
+        with Image.open(path) as img:
+            img.load()
+            if quantize and is_line_art(img):
+                out = _quantize(img)
+            else:
+                out = img
+            out.save(tmp, "PNG", optimize=True)
+        if tmp.stat().st_size < before:
+            os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return before, path.stat().st_size
+
+
+def write_webp_sibling(path: Path) -> int:
+    """Write <stem>.webp next to an image. Returns its size in bytes."""
+    dest = path.with_suffix(".webp")
+    with Image.open(path) as img:
+        lossless = is_line_art(img)
+        img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+        if lossless:
+            img.save(dest, "WEBP", lossless=True, method=6)
+        else:
+            img.save(dest, "WEBP", quality=WEBP_QUALITY, method=6)
+    return dest.stat().st_size
+
+
+def optimize_manual_images(manual_id: int) -> dict:
+    """
+    Optimize every step image of a manual, optionally add WebP siblings and
+    remove page renders. Returns a storage report.
+    """
+    report = {
+        "files_optimized": 0,
+        "bytes_before": 0,
+        "bytes_after": 0,
+        "bytes_saved": 0,
+        "webp_siblings": 0,
+        "pages_removed": 0,
+        "page_bytes_removed": 0,
+    }
+    if Image is None:
+        print("[Optimize] Pillow not installed, skipping")
+        return report
+
+    assets = manual_assets.get_step_assets(manual_id)
+    for step_number, asset in assets.items():
+        path = asset["path"]
+        try:
+            if asset["ext"] == ".png":
+                before, after = optimize_png(path)
+            else:
+                before = after = asset["size"]
+            report["bytes_before"] += before
+            report["bytes_after"] += after
+            if after < before:
+                report["files_optimized"] += 1
+            if webp_siblings_enabled():
+                write_webp_sibling(path)
+                report["webp_siblings"] += 1
+        except Exception as e:
+            print(f"[Optimize] step {step_number} failed: {e}")
+
+    if assets and not keep_page_images():
+        for page_path in (MANUALS_DIR / str(manual_id)).glob("page_*.png"):
+            try:
+                size = page_path.stat().st_size
+                page_path.unlink()
+                report["pages_removed"] += 1
+                report["page_bytes_removed"] += size
+            except OSError as e:
+                print(f"[Optimize] could not remove {page_path.name}: {e}")
+
+    report["bytes_saved"] = report["bytes_before"] - report["bytes_after"] + report["page_bytes_removed"]
+    # Step images were rewritten in place: refresh the index and listing (new ?v= hashes)
+    manual_assets.invalidate(manual_id)
+    invalidate_steps_listing(manual_id)
+    print(f"[Optimize] manual {manual_id} {report}")
+    return report
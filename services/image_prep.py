@@ -0,0 +1,176 @@
+"""
+Image preparation for vision model uploads.
+
+Step PNGs are stored at full resolution (150–300 KB, multi-MB for 300 DPI page
+renders), but GPT-4o / GPT-4.1-mini only look at a downscaled copy: the image
+is fit inside 2048x2048 and then its shortest side is reduced to 768 px.
+Uploading anything larger just costs bandwidth and latency.
+
+prepare_image() is the public entry point. It:
+  1. Checks an in-memory memo keyed by (path, mtime, size)
+  2. Hashes the file and looks for an already-prepared copy in cache/vision_images/
+  3. Otherwise downsizes to the model's effective resolution and re-encodes as
+     optimized WebP (or JPEG), keeping the original if the result is not smaller
+  4. Returns the path that should be uploaded
+
+prepare_image() never raises — if Pillow is missing or the image cannot be
+decoded, the original path is returned unchanged. Set VISION_IMAGE_PREP=0 to
+disable preparation entirely (useful to compare upload latency).
+
+get_image_prep_stats() reports how many images were prepared and how many
+bytes were saved. scripts/bench_image_prep.py measures the upload latency
+difference against Replicate's file API.
+"""
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+try:
+    from PIL import Image
+except Exception:
+    Image = None
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+VISION_CACHE_DIR = BASE_DIR / "cache" / "vision_images"
+
+# Effective resolution of the OpenAI vision models (high detail mode)
+VISION_MAX_LONG_SIDE = 2048
+VISION_MAX_SHORT_SIDE = 768
+
+VISION_IMAGE_FORMAT = os.getenv("VISION_IMAGE_FORMAT", "webp").lower()  # webp | jpeg
+VISION_IMAGE_QUALITY = int(os.getenv("VISION_IMAGE_QUALITY", "85"))
+
+_FORMAT_EXTENSIONS = {"webp": ".webp", "jpeg": ".jpg"}
+
+# (path, mtime_ns, size) -> prepared path
+_memo: Dict[Tuple[str, int, int], Path] = {}
+_memo_lock = threading.Lock()
+
+_stats = {
+    "prepared": 0,
+    "memo_hits": 0,
+    "disk_hits": 0,
+    "passthrough": 0,
+    "original_bytes": 0,
+    "prepared_bytes": 0,
+}
+
+
+def _enabled() -> bool:
+    return os.getenv("VISION_IMAGE_PREP", "1") != "0" and Image is not None
+
+
+def file_digest(path: Path) -> str:
+    """Return the SHA-256 hex digest of a file's contents."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def target_size(width: int, height: int) -> Tuple[int, int]:
+    """Return the (width, height) the vision models would downscale to."""
+    scale = min(
+        1.0,
+        VISION_MAX_LONG_SIDE / max(width, height),
+        VISION_MAX_SHORT_SIDE / min(width, height),
+    )
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def flatten_to_rgb(img):
+    """Composite transparent images onto white (manual diagrams are drawn on white)."""
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        return background
+    if img.mode != "RGB":
+        return img.convert("RGB")
+    return img
+
+
+def encode_image(img, dest: Path, fmt: str, quality: int) -> None:
+    """Write a PIL image to dest using optimized settings for the given format."""
+    if fmt == "webp":
+        img.save(dest, "WEBP", quality=quality, method=6)
+    elif fmt == "avif":
+        img.save(dest, "AVIF", quality=quality)
+    else:
+        img.save(dest, "JPEG", quality=quality, optimize=True, progressive=True)
+
+
+def _encode_prepared(source: Path, dest: Path) -> None:
+    with Image.open(source) as img:
+        img = flatten_to_rgb(img)
+        size = target_size(*img.size)
+        if size != img.size:
+            img = img.resize(size, Image.LANCZOS)
+        tmp = dest.with_name(dest.name + ".tmp")
+        encode_image(img, tmp, VISION_IMAGE_FORMAT, VISION_IMAGE_QUALITY)
+        os.replace(tmp, dest)
+
+
+def prepare_image(path: Path) -> Path:
+    """
+    Return the path of a model-ready version of the image at `path`.
+
+    The prepared copy is downsized to the vision models' effective resolution
+    and re-encoded; if that does not make the file smaller, the original path
+    is returned.
+    """
+    path = Path(path)
+    if not _enabled():
+        return path
+
+    try:
+        st = path.stat()
+    except OSError:
+        return path
+
+    key = (str(path), st.st_mtime_ns, st.st_size)
+    with _memo_lock:
+        cached = _memo.get(key)
+    if cached is not None and cached.exists():
+        _stats["memo_hits"] += 1
+        return cached
+
+    prepared: Optional[Path] = None
+    try:
+        digest = file_digest(path)
+        ext = _FORMAT_EXTENSIONS.get(VISION_IMAGE_FORMAT, ".jpg")
+        dest = VISION_CACHE_DIR / f"{digest[:32]}-{VISION_MAX_SHORT_SIDE}q{VISION_IMAGE_QUALITY}{ext}"
+        if dest.exists():
+            _stats["disk_hits"] += 1
+        else:
+            VISION_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            _encode_prepared(path, dest)
+            _stats["prepared"] += 1
+            _stats["original_bytes"] += st.st_size
+            _stats["prepared_bytes"] += min(dest.stat().st_size, st.st_size)
+            print(
+                f"[ImagePrep] {path.name}: {st.st_size} -> {dest.stat().st_size} bytes "
+                f"({VISION_IMAGE_FORMAT}, saved {max(0, st.st_size - dest.stat().st_size)})"
+            )
+        prepared = dest if dest.stat().st_size < st.st_size else path
+    except Exception as e:
+        print(f"[ImagePrep] Could not prepare {path}: {e}")
+        prepared = path
+
+    if prepared == path:
+        _stats["passthrough"] += 1
+
+    with _memo_lock:
+        _memo[key] = prepared
+    return prepared
+
+
+def get_image_prep_stats() -> dict:
+    """Return counters describing preparation work and bytes saved so far."""
+    stats = dict(_stats)
+    stats["bytes_saved"] = stats["original_bytes"] - stats["prepared_bytes"]
+    stats["enabled"] = _enabled()
+    return stats
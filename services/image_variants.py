@@ -0,0 +1,194 @@
+"""
+Responsive step image variants with a derived-image disk cache.
+
+Step PNGs are 150 KB–1 MB, but thumbnails and phone screens need a fraction
+of that. get_variant() derives a resized, re-encoded copy of a step image:
+
+  - width is snapped up to one of VARIANT_WIDTHS (bounding the number of
+    cached files) and never exceeds the original width
+  - format is webp, avif (when Pillow can encode it) or jpeg; quality 30–95
+  - encoding reuses image_prep.flatten_to_rgb() / encode_image()
+
+Variants live in cache/image_variants/, named by the source's content hash,
+width, quality and format, so a changed source gets new files and stale ones
+simply age out. The directory is kept under VARIANT_CACHE_MAX_BYTES by LRU
+eviction; a cache hit refreshes the file's mtime (at most once per
+VARIANT_TOUCH_INTERVAL) so mtime order approximates recency.
+
+variant_srcset() builds the srcset string the steps listing returns.
+"""
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .image_prep import Image, encode_image, flatten_to_rgb
+from .static_assets import asset_version, content_digest
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+VARIANT_CACHE_DIR = BASE_DIR / "cache" / "image_variants"
+
+VARIANT_WIDTHS = (160, 320, 640, 960, 1280, 1920)
+# Widths advertised in srcset (thumbnail through desktop)
+SRCSET_WIDTHS = (320, 640, 960, 1280)
+DEFAULT_FORMAT = "webp"
+DEFAULT_QUALITY = 80
+MIN_QUALITY, MAX_QUALITY = 30, 95
+
+VARIANT_CACHE_MAX_BYTES = int(os.getenv("VARIANT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+VARIANT_SWEEP_INTERVAL = 300
+VARIANT_TOUCH_INTERVAL = 3600
+
+FORMAT_EXTENSIONS = {"webp": ".webp", "avif": ".avif", "jpeg": ".jpg"}
+MEDIA_TYPES = {"webp": "image/webp", "avif": "image/avif", "jpeg": "image/jpeg"}
+
+_generate_locks: Dict[str, threading.Lock] = {}
+_locks_lock = threading.Lock()
+_sweep_lock = threading.Lock()
+_last_sweep = 0.0
+
+_stats = {"hits": 0, "generated": 0, "evicted": 0}
+
+
+def supported_formats() -> List[str]:
+    if Image is None:
+        return []
+    formats = ["webp", "jpeg"]
+    if ".avif" in Image.registered_extensions():
+        formats.append("avif")
+    return formats
+
+
+def snap_width(width: int) -> int:
+    """Round a requested width up to the nearest VARIANT_WIDTHS entry."""
+    for candidate in VARIANT_WIDTHS:
+        if width <= candidate:
+            return candidate
+    return VARIANT_WIDTHS[-1]
+
+
+def _variant_path(source: Path, width: int, fmt: str, quality: int) -> Path:
+    digest = content_digest(source)[:16]
+    return VARIANT_CACHE_DIR / f"{digest}_{width}w_q{quality}{FORMAT_EXTENSIONS[fmt]}"
+
+
+def _generate(source: Path, dest: Path, width: int, fmt: str, quality: int) -> None:
+    with Image.open(source) as img:
+        if fmt == "jpeg" or img.mode not in ("RGB", "RGBA"):
+            img = flatten_to_rgb(img)
+        if img.width > width:
+            height = max(1, round(img.height * width / img.width))
+            img = img.resize((width, height), Image.LANCZOS)
+        tmp = dest.with_name(f"{dest.name}.{threading.get_ident()}.tmp")
+        encode_image(img, tmp, fmt, quality)
+        os.replace(tmp, dest)
+
+
+def get_variant(source: Path, width: int, fmt: str = DEFAULT_FORMAT, quality: int = DEFAULT_QUALITY) -> Path:
+    """
+    Return the path of a cached variant of `source`, generating it if needed.
+    Raises ValueError for an unsupported format.
+    """
+    if fmt not in supported_formats():
+        raise ValueError(f"Unsupported image format: {fmt}")
+    width = snap_width(width)
+    quality = max(MIN_QUALITY, min(MAX_QUALITY, quality))
+    dest = _variant_path(source, width, fmt, quality)
+
+    try:
+        st = dest.stat()
+        if time.time() - st.st_mtime > VARIANT_TOUCH_INTERVAL:
+            os.utime(dest)
+        _stats["hits"] += 1
+        return dest
+    except OSError:
+        pass
+
+    with _locks_lock:
+        lock = _generate_locks.setdefault(dest.name, threading.Lock())
+    with lock:
+        if not dest.exists():
+            VARIANT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            _generate(source, dest, width, fmt, quality)
+            _stats["generated"] += 1
+            print(f"[Variants] {source.name} -> {dest.name} ({dest.stat().st_size} bytes)")
+    with _locks_lock:
+        _generate_locks.pop(dest.name, None)
+    _maybe_sweep()
+    return dest
+
+
+def sweep_variant_cache(max_bytes: int = VARIANT_CACHE_MAX_BYTES) -> int:
+    """Evict least recently used variants until the cache is under max_bytes. Returns files removed."""
+    if not VARIANT_CACHE_DIR.exists():
+        return 0
+    entries = []
+    for path in VARIANT_CACHE_DIR.iterdir():
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for mtime, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    if removed:
+        _stats["evicted"] += removed
+        print(f"[Variants] Evicted {removed} variant(s); {total} bytes remain")
+    return removed
+
+
+def _maybe_sweep() -> None:
+    global _last_sweep
+    if time.time() - _last_sweep < VARIANT_SWEEP_INTERVAL:
+        return
+    if not _sweep_lock.acquire(blocking=False):
+        return
+    try:
+        _last_sweep = time.time()
+        sweep_variant_cache()
+    except Exception as e:
+        print(f"[Variants] Sweep failed: {e}")
+    finally:
+        _sweep_lock.release()
+
+
+def _image_width(source: Path) -> Optional[int]:
+    try:
+        with Image.open(source) as img:
+            return img.width
+    except Exception:
+        return None
+
+
+def variant_url(manual_id: int, step_number: int, source: Path, width: int, fmt: str = DEFAULT_FORMAT) -> str:
+    base_url = os.getenv("APP_URL", "http://localhost:4000").rstrip("/")
+    return (
+        f"{base_url}/api/manuals/{manual_id}/steps/{step_number}/image/variant"
+        f"?width={width}&format={fmt}&v={asset_version(source)}"
+    )
+
+
+def variant_srcset(manual_id: int, step_number: int, source: Path, fmt: str = DEFAULT_FORMAT) -> Optional[str]:
+    """Return a srcset string ("<url> 320w, <url> 640w, ...") for a step image, or None without Pillow."""
+    if fmt not in supported_formats():
+        return None
+    original_width = _image_width(source)
+    if not original_width:
+        return None
+    # Every advertised width below the original, plus the full-width variant
+    widths = [w for w in SRCSET_WIDTHS if w < original_width] + [snap_width(original_width)]
+    return ", ".join(
+        f"{variant_url(manual_id, step_number, source, w, fmt)} {min(w, original_width)}w" for w in widths
+    )
+
+
+def get_variant_cache_stats() -> dict:
+    return dict(_stats)
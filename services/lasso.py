@@ -1,30 +1,74 @@
 """
 Lasso screenshot service.
 
-Receives a base64-encoded PNG crop from the frontend's LassoTool, saves it to
-lasso_screenshots/lasso.png, then sends both the crop and the full step image
-to GPT-4o via Replicate.
+Receives a PNG crop from the frontend's LassoTool (base64 in JSON, or a
+multipart file upload that is streamed straight to disk), saves it to
+lasso_screenshots/, then sends both the crop and the full step image to GPT-4o
+via Replicate.
 
 The AI returns a JSON object with:
   summary   — 1-3 sentence description of what the lassoed region shows
   questions — exactly 2 contextual questions the user might want to ask
 
-Note: lasso.png is always overwritten; concurrent users will clobber each
-other's screenshots. This is acceptable for single-user or sequential use but
-should be addressed (e.g. per-session filenames) for concurrent deployment.
+Storage is content-addressed: each crop is saved as <sha256>.png, so every
+request gets its own URL and identical crops are written only once. The
+directory is bounded by sweep_lasso_storage(), which removes files older than
+LASSO_MAX_AGE_SECONDS and then the least recently used files until the total
+size is under LASSO_MAX_BYTES. The sweep runs at most once every
+LASSO_SWEEP_INTERVAL seconds, piggybacking on uploads.
+
+Analyses are memoized per (manual, step, perceptual hash of the crop). The
+hash is a 64-bit difference hash, so re-lassoing nearly the same region (a
+few pixels off, as is common on touch devices) still hits if the Hamming
+distance is within LASSO_PHASH_THRESHOLD and the aspect ratio is similar.
+Memoized analyses are persisted in the lasso_analyses table.
 """
 import os
+import time
+import uuid
+import hashlib
+import threading
 from pathlib import Path
 import base64
 import json
 import replicate
+from typing import BinaryIO, Dict, List, Optional, Tuple
 from pydantic import BaseModel
 
+from .replicate_files import open_vision_inputs
+from .metrics import track_replicate
+from . import db as db_helper
+from .manual_assets import find_step_image
+
+try:
+    from PIL import Image
+except Exception:
+    Image = None
+
 # Absolute path so the directory resolves correctly regardless of cwd
 LASSO_STORAGE_DIR = Path(__file__).resolve().parent.parent / "lasso_screenshots"
 LASSO_STORAGE_DIR.mkdir(exist_ok=True)
 
-MANUALS_DIR = Path(__file__).resolve().parent.parent / "public" / "manuals"
+# Bounds for the on-disk lasso screenshot cache
+LASSO_MAX_BYTES = int(os.getenv("LASSO_MAX_BYTES", str(200 * 1024 * 1024)))
+LASSO_MAX_AGE_SECONDS = int(os.getenv("LASSO_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+LASSO_SWEEP_INTERVAL = 300
+
+_last_sweep = 0.0
+_sweep_lock = threading.Lock()
+
+# Max differing bits (out of 64) for two crops to count as the same selection
+LASSO_PHASH_THRESHOLD = int(os.getenv("LASSO_PHASH_THRESHOLD", "6"))
+# Max relative difference in width/height ratio for a near-duplicate hit
+LASSO_ASPECT_TOLERANCE = 0.15
+# Crops whose hash has fewer set (or unset) bits than this are mostly blank
+# line art: equal neighbouring pixels hash to 0, so unrelated small crops of
+# the same step collide. They are never answered from the memo.
+LASSO_MIN_HASH_BITS = 16
+
+# (manual_id, step) -> [(phash, aspect, {"summary", "questions"})], loaded from DB on first use
+_analysis_cache: Dict[Tuple[int, int], List[Tuple[int, float, dict]]] = {}
+_analysis_lock = threading.Lock()
 
 # Vision model for analyzing the lassoed image
 VISION_MODEL = "openai/gpt-4o"
@@ -52,30 +96,221 @@ class LassoImageData(BaseModel):
     manual_id: int = 1  # default to manual 1 for backwards compat
 
 
+def _image_extension(image_bytes: bytes) -> str:
+    """Pick a file extension from the image's magic bytes (frontend sends PNG)."""
+    if image_bytes.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+        return ".webp"
+    return ".png"
+
+
+def _commit_lasso_file(tmp_path: Path, digest: str, ext: str) -> Path:
+    """Move a fully written temp file to its content-addressed name (or drop it if already stored)."""
+    file_path = LASSO_STORAGE_DIR / f"{digest[:32]}{ext}"
+    if file_path.exists():
+        tmp_path.unlink(missing_ok=True)
+        os.utime(file_path)
+    else:
+        os.replace(tmp_path, file_path)
+    _maybe_sweep()
+    return file_path
+
+
+def store_lasso_bytes(image_bytes: bytes) -> Path:
+    """
+    Store decoded lasso image bytes under a content-addressed name and return
+    the file path. Identical crops map to the same file and are not rewritten;
+    their mtime is refreshed so the sweeper treats them as recently used.
+    """
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    file_path = LASSO_STORAGE_DIR / f"{digest[:32]}{_image_extension(image_bytes)}"
+
+    if file_path.exists():
+        os.utime(file_path)
+        _maybe_sweep()
+        return file_path
+
+    tmp_path = LASSO_STORAGE_DIR / f".{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(image_bytes)
+    return _commit_lasso_file(tmp_path, digest, _image_extension(image_bytes))
+
+
+def store_lasso_stream(stream: BinaryIO, chunk_size: int = 64 * 1024) -> Path:
+    """
+    Stream an uploaded lasso image straight to disk while hashing it, without
+    holding the whole file in memory. Same naming/dedup rules as store_lasso_bytes().
+    """
+    h = hashlib.sha256()
+    head = b""
+    tmp_path = LASSO_STORAGE_DIR / f".{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in iter(lambda: stream.read(chunk_size), b""):
+                if len(head) < 12:
+                    head += chunk[:12]
+                h.update(chunk)
+                f.write(chunk)
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return _commit_lasso_file(tmp_path, h.hexdigest(), _image_extension(head))
+
+
 def save_lasso_screenshot(image_data: str) -> Path:
-    """Save a lasso screenshot as lasso.png and return the file path."""
+    """Save a base64 lasso screenshot (content-addressed) and return the file path."""
     # Remove the data URL prefix if present (e.g., "data:image/png;base64,")
     if ',' in image_data:
         image_data = image_data.split(',')[1]
 
-    # Decode base64 and save
-    image_bytes = base64.b64decode(image_data)
-    file_path = LASSO_STORAGE_DIR / "lasso.png"
+    return store_lasso_bytes(base64.b64decode(image_data))
 
-    with open(file_path, "wb") as f:
-        f.write(image_bytes)
 
-    return file_path
+def lasso_image_url(file_path: Path) -> str:
+    """Public URL for a stored lasso screenshot."""
+    base_url = os.getenv("APP_URL", "http://localhost:4000").rstrip("/")
+    return f"{base_url}/lasso_screenshots/{file_path.name}"
+
+
+def sweep_lasso_storage(max_bytes: int = LASSO_MAX_BYTES, max_age_seconds: int = LASSO_MAX_AGE_SECONDS) -> int:
+    """
+    Evict lasso screenshots older than max_age_seconds, then the least recently
+    used ones until the directory is under max_bytes. Returns the number of
+    files removed.
+    """
+    now = time.time()
+    entries = []
+    for path in LASSO_STORAGE_DIR.iterdir():
+        if not path.is_file():
+            continue
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+
+    removed = 0
+    kept = []
+    for mtime, size, path in entries:
+        # Leftover temp files and expired screenshots go first
+        if now - mtime > max_age_seconds or (path.name.startswith(".") and now - mtime > 60):
+            path.unlink(missing_ok=True)
+            removed += 1
+        else:
+            kept.append((mtime, size, path))
+
+    total = sum(size for _, size, _ in kept)
+    for mtime, size, path in sorted(kept):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+
+    if removed:
+        print(f"[Lasso] Swept {removed} screenshot(s); {total} bytes remain")
+    return removed
+
+
+def _maybe_sweep() -> None:
+    global _last_sweep
+    if time.time() - _last_sweep < LASSO_SWEEP_INTERVAL:
+        return
+    if not _sweep_lock.acquire(blocking=False):
+        return
+    try:
+        _last_sweep = time.time()
+        sweep_lasso_storage()
+    except Exception as e:
+        print(f"[Lasso] Sweep failed: {e}")
+    finally:
+        _sweep_lock.release()
 
 
-def _find_step_image(step_number: int, manual_id: int = 1) -> Path:
-    """Find the full step image file under public/manuals/<manual_id>/."""
-    manual_dir = MANUALS_DIR / str(manual_id)
-    for ext in [".png", ".jpg", ".jpeg"]:
-        potential_path = manual_dir / f"step{step_number}{ext}"
-        if potential_path.exists():
-            return potential_path
-    raise FileNotFoundError(f"Step image not found for manual {manual_id}, step {step_number}")
+def crop_fingerprint(crop_path: Path) -> Optional[Tuple[int, float]]:
+    """
+    Return (64-bit difference hash, aspect ratio) for a stored crop, or None
+    if it cannot be decoded. Pillow decodes straight from the file, so the
+    encoded crop is not read into memory a second time.
+    """
+    if Image is None:
+        return None
+    try:
+        with Image.open(crop_path) as img:
+            aspect = img.width / max(img.height, 1)
+            gray = img.convert("L").resize((9, 8), Image.LANCZOS)
+            pixels = list(gray.getdata())
+    except Exception:
+        return None
+
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value, aspect
+
+
+def _cached_analyses(manual_id: int, step_number: int) -> List[Tuple[int, float, dict]]:
+    key = (manual_id, step_number)
+    with _analysis_lock:
+        entries = _analysis_cache.get(key)
+    if entries is not None:
+        return entries
+
+    try:
+        rows = db_helper.get_lasso_analyses(manual_id, step_number)
+    except Exception as e:
+        # The memo is an optimization; analyze without it rather than fail the
+        # request, and keep memoizing this step's new analyses in memory
+        print(f"[Lasso] Could not load memoized analyses: {e}")
+        rows = []
+
+    entries = []
+    for row in rows:
+        try:
+            entries.append((
+                int(row["phash"], 16),
+                float(row["aspect"]),
+                {"summary": row["summary"], "questions": list(row["questions"])},
+            ))
+        except (TypeError, ValueError):
+            continue
+    with _analysis_lock:
+        return _analysis_cache.setdefault(key, entries)
+
+
+def find_cached_analysis(manual_id: int, step_number: int, fingerprint: Tuple[int, float]) -> Optional[dict]:
+    """Return the closest memoized analysis within the near-duplicate threshold."""
+    phash, aspect = fingerprint
+    set_bits = bin(phash).count("1")
+    if min(set_bits, 64 - set_bits) < LASSO_MIN_HASH_BITS:
+        return None
+    best = None
+    best_distance = LASSO_PHASH_THRESHOLD + 1
+    for other_hash, other_aspect, analysis in _cached_analyses(manual_id, step_number):
+        if abs(aspect - other_aspect) > LASSO_ASPECT_TOLERANCE * max(aspect, other_aspect):
+            continue
+        distance = bin(phash ^ other_hash).count("1")
+        if distance < best_distance:
+            best, best_distance = analysis, distance
+    return best
+
+
+def remember_analysis(manual_id: int, step_number: int, fingerprint: Tuple[int, float], analysis: dict) -> None:
+    """Memoize an analysis in memory and persist it to the DB."""
+    phash, aspect = fingerprint
+    entries = _cached_analyses(manual_id, step_number)
+    with _analysis_lock:
+        entries.insert(0, (phash, aspect, analysis))
+    try:
+        db_helper.store_lasso_analysis(
+            manual_id, step_number, f"{phash:016x}", aspect, analysis["summary"], analysis["questions"]
+        )
+    except Exception as e:
+        print(f"[Lasso] Could not persist analysis: {e}")
 
 
 def analyze_lasso_image(data: LassoImageData) -> dict:
@@ -84,26 +319,46 @@ def analyze_lasso_image(data: LassoImageData) -> dict:
     using both the lassoed crop and the full step image for context.
 
     Returns:
-        dict with keys: success, summary, questions
+        dict with keys: success, summary, questions, image_url, cached
     """
     # 1. Save the lasso screenshot
     lasso_path = save_lasso_screenshot(data.image_data)
+    return analyze_lasso_crop(lasso_path, data.step, data.manual_id)
 
-    # 2. Find the full step image
-    step_image_path = _find_step_image(data.step, data.manual_id)
 
-    print(f"[Lasso] Analyzing lasso image for step {data.step}")
+def analyze_lasso_crop(lasso_path: Path, step: int, manual_id: int = 1) -> dict:
+    """
+    Analyze an already-stored lasso crop, reusing a memoized analysis when a
+    near-identical crop of the same step was analyzed before.
+    """
+    # 2. Find the full step image
+    step_image_path = find_step_image(manual_id, step)
+
+    fingerprint = crop_fingerprint(lasso_path)
+    if fingerprint is not None:
+        cached = find_cached_analysis(manual_id, step, fingerprint)
+        if cached is not None:
+            print(f"[Lasso] Reusing memoized analysis for manual {manual_id}, step {step}")
+            return {
+                "success": True,
+                "summary": cached["summary"],
+                "questions": list(cached["questions"]),
+                "image_url": lasso_image_url(lasso_path),
+                "cached": True,
+            }
+
+    print(f"[Lasso] Analyzing lasso image for step {step}")
     print(f"[Lasso] Step image: {step_image_path}")
     print(f"[Lasso] Lasso crop: {lasso_path}")
 
     # 3. Send both images to GPT-4o via Replicate
     try:
         response_parts = []
-        with open(step_image_path, "rb") as step_img, open(lasso_path, "rb") as lasso_img:
+        with open_vision_inputs(step_image_path, lasso_path) as image_input, track_replicate("lasso", VISION_MODEL):
             for event in replicate.stream(
                 VISION_MODEL,
                 input={
-                    "image_input": [step_img, lasso_img],
+                    "image_input": image_input,
                     "prompt": ANALYSIS_PROMPT,
                 }
             ):
@@ -131,14 +386,15 @@ def analyze_lasso_image(data: LassoImageData) -> dict:
         elif len(questions) > 2:
             questions = questions[:2]
 
-        base_url = os.getenv("APP_URL", "http://localhost:4000").rstrip("/")
-        stored_image_url = f"{base_url}/lasso_screenshots/lasso.png"
+        if fingerprint is not None:
+            remember_analysis(manual_id, step, fingerprint, {"summary": summary, "questions": questions})
 
         return {
             "success": True,
             "summary": summary,
             "questions": questions,
-            "image_url": stored_image_url,
+            "image_url": lasso_image_url(lasso_path),
+            "cached": False,
         }
 
     except json.JSONDecodeError as e:
@@ -150,7 +406,8 @@ def analyze_lasso_image(data: LassoImageData) -> dict:
                 "What is this part?",
                 "How do I assemble this?",
             ],
-            "image_url": f"{os.getenv('APP_URL', 'http://localhost:4000').rstrip('/')}/lasso_screenshots/lasso.png"
+            "image_url": lasso_image_url(lasso_path),
+            "cached": False,
         }
     except Exception as e:
         print(f"[Lasso] AI analysis failed: {e}")
@@ -161,5 +418,6 @@ def analyze_lasso_image(data: LassoImageData) -> dict:
                 "What is this part?",
                 "How do I assemble this?",
             ],
-            "image_url": f"{os.getenv('APP_URL', 'http://localhost:4000').rstrip('/')}/lasso_screenshots/lasso.png"
+            "image_url": lasso_image_url(lasso_path),
+            "cached": False,
         }
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""
+Cached index of the step images under public/manuals/<id>/.
+
+Step discovery used to run iterdir() plus a regex on the manual directory for
+every chat prompt and steps listing, and step images were located by probing
+stepN.png / .jpg / .jpeg with exists() in several modules. This index scans a
+manual directory once and maps each step number to
+{"step_number", "path", "ext", "size", "mtime"}.
+
+Each lookup costs a single stat() of the manual directory: the index is
+rebuilt only when the directory's mtime changes (a step image was added,
+removed or renamed). Overwriting an existing file in place does not touch the
+directory mtime, so writers that do that (segmentation) call invalidate().
+
+When a step has several images, .png wins over .jpg over .jpeg.
+"""
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+MANUALS_DIR = Path(__file__).resolve().parent.parent / "public" / "manuals"
+
+STEP_IMAGE_PATTERN = re.compile(r"^step(\d+)\.(png|jpg|jpeg)$", re.IGNORECASE)
+EXTENSION_PRIORITY = (".png", ".jpg", ".jpeg")
+
+# manual_id -> (directory mtime_ns, {step_number: asset})
+_index: Dict[int, Tuple[int, Dict[int, dict]]] = {}
+_index_lock = threading.Lock()
+
+_stats = {"scans": 0, "hits": 0}
+
+
+def _scan(manual_dir: Path) -> Dict[int, dict]:
+    assets: Dict[int, dict] = {}
+    for entry in manual_dir.iterdir():
+        m = STEP_IMAGE_PATTERN.match(entry.name)
+        if not m or not entry.is_file():
+            continue
+        step_number = int(m.group(1))
+        ext = entry.suffix.lower()
+        current = assets.get(step_number)
+        if current and EXTENSION_PRIORITY.index(current["ext"]) <= EXTENSION_PRIORITY.index(ext):
+            continue
+        st = entry.stat()
+        assets[step_number] = {
+            "step_number": step_number,
+            "path": entry,
+            "ext": ext,
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+        }
+    return dict(sorted(assets.items()))
+
+
+def get_step_assets(manual_id: int) -> Dict[int, dict]:
+    """Return {step_number: asset} for a manual, ordered by step number ({} if it has no directory)."""
+    manual_dir = MANUALS_DIR / str(manual_id)
+    try:
+        dir_mtime = manual_dir.stat().st_mtime_ns
+    except OSError:
+        with _index_lock:
+            _index.pop(manual_id, None)
+        return {}
+
+    with _index_lock:
+        cached = _index.get(manual_id)
+        if cached and cached[0] == dir_mtime:
+            _stats["hits"] += 1
+            return cached[1]
+
+    assets = _scan(manual_dir)
+    with _index_lock:
+        _index[manual_id] = (dir_mtime, assets)
+        _stats["scans"] += 1
+    return assets
+
+
+def manual_exists(manual_id: int) -> bool:
+    """True if public/manuals/<manual_id>/ exists."""
+    return (MANUALS_DIR / str(manual_id)).is_dir()
+
+
+def discover_step_numbers(manual_id: int) -> List[int]:
+    """
+    Find all step numbers that have an image in public/manuals/<manual_id>/ (step1.png, step2.jpg, etc.).
+    Returns sorted list of step numbers for that manual.
+    """
+    return list(get_step_assets(manual_id))
+
+
+def get_step_asset(manual_id: int, step_number: int) -> Optional[dict]:
+    return get_step_assets(manual_id).get(step_number)
+
+
+def find_step_image(manual_id: int, step_number: int) -> Path:
+    """Return the image path for a step, raising FileNotFoundError if there is none."""
+    asset = get_step_asset(manual_id, step_number)
+    if asset is None:
+        raise FileNotFoundError(f"Step image not found for manual {manual_id}, step {step_number}")
+    return asset["path"]
+
+
+def invalidate(manual_id: Optional[int] = None) -> None:
+    """Drop the cached index for one manual (or all), e.g. after step images are rewritten."""
+    with _index_lock:
+        if manual_id is None:
+            _index.clear()
+        else:
+            _index.pop(manual_id, None)
+
+
+def get_manual_asset_stats() -> dict:
+    """Return directory scan vs cached lookup counts."""
+    with _index_lock:
+        return dict(_stats, manuals=len(_index))
@@ -41,6 +41,10 @@ from .db import (
    update_page_boxes,
 )
 from .db_columns import StepColumn
+from . import manual_assets
+from .steps_listing import invalidate_steps_listing
+from .step_sprites import invalidate_step_sprite
+from .metrics import track_replicate
 
 
 # environment/config
@@ -149,7 +153,8 @@ def _call_annotator(page_path: Path) -> Path:
            "prompt": STEP_SEGMENTATION_PROMPT,
            "image_input": [f],
        }
-       output = replicate.run(NANO_MODEL, input=input_data)
+       with track_replicate("manual_processor", NANO_MODEL):
+           output = replicate.run(NANO_MODEL, input=input_data)
 
 
    # model output is often a URL or list; convert to string
@@ -275,7 +280,8 @@ def ingest_pdf_pages(path: Path, manual_id: int, job_id: str = None) -> int:
        page_num = page_idx + 1
        page_filename = f"page_{page_num}.png"
        page_path = manual_subdir / page_filename
-       pil_img.save(page_path, "PNG")
+       # optimize=True: smaller upload to the annotator and less disk until segmentation
+       pil_img.save(page_path, "PNG", optimize=True)
       
        # run annotation model for suggestions
        try:
@@ -308,12 +314,26 @@ def ingest_pdf_pages(path: Path, manual_id: int, job_id: str = None) -> int:
 
 
 
+def missing_page_images(manual_id: int, page_numbers) -> list:
+   """Page numbers whose page_N.png render is not on disk."""
+   manual_subdir = MANUALS_DIR / str(manual_id)
+   return [n for n in page_numbers if not (manual_subdir / f"page_{n}.png").exists()]
+
+
 def segment_manual_into_steps(manual_id: int) -> int:
    """Phase 2: Confirmed Boxes -> Cropped Step Images."""
    pages_data = get_pages_for_manual(manual_id)
    manual_subdir = MANUALS_DIR / str(manual_id)
    step_counter = 0
 
+   page_numbers = [p["page_number"] for p in pages_data]
+   if page_numbers and len(missing_page_images(manual_id, page_numbers)) == len(page_numbers):
+       # image_optimizer removes page renders after segmentation when KEEP_PAGE_IMAGES=0
+       raise FileNotFoundError(
+           f"Page images for manual {manual_id} were removed after segmentation; "
+           "set KEEP_PAGE_IMAGES=1 to allow re-segmentation"
+       )
+
 
    for page in pages_data:
        page_num = page["page_number"]
@@ -347,6 +367,10 @@ def segment_manual_into_steps(manual_id: int) -> int:
            ensure_manual_and_step(manual_id, step_counter, image_url)
 
 
+   # Step images may have been overwritten in place (directory mtime unchanged)
+   manual_assets.invalidate(manual_id)
+   invalidate_steps_listing(manual_id)
+   invalidate_step_sprite(manual_id)
    return step_counter
 
 
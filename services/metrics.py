@@ -0,0 +1,259 @@
+"""
+In-process metrics exposed in the Prometheus text format at GET /metrics.
+
+Collected:
+  http_request_duration_seconds       per method, route template and status
+                                      (RequestTimingMiddleware; streaming
+                                      responses are timed to their last byte)
+  db_query_duration_seconds           per services/db.py helper and outcome
+                                      (@timed_db; "skipped" without a database)
+  replicate_request_duration_seconds  per service and model (track_replicate)
+  replicate_failures_total            per service and model
+  cache_hit_ratio / cache_stat        from the existing get_*_stats()
+                                      counters, read at scrape time
+
+No client library is needed: counters and histograms are plain dicts under a
+lock, rendered on demand. The service stats modules are imported lazily at
+scrape time, so db.py can import this module without cycles.
+"""
+import functools
+import importlib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+REPLICATE_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(labels[n] for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets) + (float("inf"),)
+        # labels -> [per-bucket counts..., sum, count]
+        self._values: Dict[Tuple, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(labels[n] for n in self.labelnames)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+                    break
+            entry[-2] += value
+            entry[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        for key, entry in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {entry[-2]!r}")
+            lines.append(f"{self.name}_count{labels} {entry[-1]}")
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status"), REQUEST_BUCKETS
+)
+DB_DURATION = Histogram(
+    "db_query_duration_seconds", "services/db.py helper latency.", ("helper", "outcome"), DB_BUCKETS
+)
+REPLICATE_DURATION = Histogram(
+    "replicate_request_duration_seconds",
+    "Replicate call latency by calling service and model.",
+    ("service", "model", "outcome"),
+    REPLICATE_BUCKETS,
+)
+REPLICATE_FAILURES = Counter(
+    "replicate_failures_total", "Replicate calls that raised, by calling service and model.", ("service", "model")
+)
+
+
+def timed_db(fn: Optional[Callable] = None, *, enabled: Optional[Callable[[], bool]] = None) -> Callable:
+    """
+    Record the latency of a services/db.py helper under its function name.
+    Calls made while `enabled()` is false (no database configured, so the
+    helper returns its no-op default) are recorded with outcome="skipped".
+    """
+    if fn is None:
+        return functools.partial(timed_db, enabled=enabled)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = fn(*args, **kwargs)
+            outcome = "ok" if enabled is None or enabled() else "skipped"
+            return result
+        finally:
+            DB_DURATION.observe(time.perf_counter() - start, helper=fn.__name__, outcome=outcome)
+    return wrapper
+
+
+@contextmanager
+def track_replicate(service: str, model: str) -> Iterator[None]:
+    """
+    Time a Replicate call (including consuming a replicate.stream() iterator
+    inside the block) and count it as a failure if the block raises.
+    """
+    # Drop the version hash from "owner/name:version"
+    model = model.split(":", 1)[0]
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        REPLICATE_DURATION.observe(time.perf_counter() - start, service=service, model=model, outcome="error")
+        REPLICATE_FAILURES.inc(service=service, model=model)
+        raise
+    REPLICATE_DURATION.observe(time.perf_counter() - start, service=service, model=model, outcome="ok")
+
+
+def _route_label(scope, status: int) -> str:
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path:
+        return path
+    # Keep label cardinality bounded: static mounts by prefix, 404s together
+    if status == 404:
+        return "unmatched"
+    segments = scope.get("path", "/").split("/")
+    return f"/{segments[1]}/*" if len(segments) > 2 else scope.get("path", "/")
+
+
+class RequestTimingMiddleware:
+    """Pure ASGI middleware recording http_request_duration_seconds."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                method=scope.get("method", ""),
+                route=_route_label(scope, status),
+                status=str(status),
+            )
+
+
+# cache name -> (stats getter "module:function", hit fields, miss fields)
+CACHE_STATS = {
+    "manual_assets": ("manual_assets:get_manual_asset_stats", ("hits",), ("scans",)),
+    "steps_listing": ("steps_listing:get_steps_listing_stats", ("hits",), ("builds",)),
+    "image_prep": ("image_prep:get_image_prep_stats", ("memo_hits", "disk_hits"), ("prepared",)),
+    "replicate_files": ("replicate_files:get_file_reference_stats", ("hits",), ("uploads", "failures")),
+    "tts": ("tts:get_tts_cache_stats", ("hits",), ("misses",)),
+    "image_variants": ("image_variants:get_variant_cache_stats", ("hits",), ("generated",)),
+    "step_sprites": ("step_sprites:get_step_sprite_stats", ("hits",), ("builds",)),
+    "glb_lods": ("glb_pipeline:get_glb_pipeline_stats", ("hits",), ("builds", "failures")),
+    "orientation_prefilter": (
+        "orientation_prefilter:get_prefilter_stats", ("unchanged", "rotated", "flipped"), ("uncertain",)
+    ),
+    "asset_serving": ("asset_serving:get_asset_serving_stats", (), ()),
+}
+
+
+def _load_stats(target: str) -> Optional[dict]:
+    module_name, _, func_name = target.partition(":")
+    try:
+        module = importlib.import_module(f"{__package__}.{module_name}")
+        return getattr(module, func_name)()
+    except Exception as e:
+        print(f"[Metrics] Could not read {target}: {e}")
+        return None
+
+
+def _render_cache_stats() -> List[str]:
+    ratio_lines = ["# HELP cache_hit_ratio Hits / (hits + misses) since process start.", "# TYPE cache_hit_ratio gauge"]
+    stat_lines = ["# HELP cache_stat Raw cache counters from each service's stats function.", "# TYPE cache_stat gauge"]
+    for cache, (target, hit_fields, miss_fields) in CACHE_STATS.items():
+        stats = _load_stats(target)
+        if stats is None:
+            continue
+        for field, value in sorted(stats.items()):
+            if isinstance(value, (bool, int, float)):
+                stat_lines.append(f'cache_stat{{cache="{cache}",stat="{field}"}} {int(value) if isinstance(value, bool) else value}')
+        hits = sum(stats.get(f, 0) for f in hit_fields)
+        total = hits + sum(stats.get(f, 0) for f in miss_fields)
+        if total:
+            ratio_lines.append(f'cache_hit_ratio{{cache="{cache}"}} {hits / total!r}')
+    return ratio_lines + stat_lines
+
+
+def render_metrics() -> str:
+    """Return every metric in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in (REQUEST_DURATION, DB_DURATION, REPLICATE_DURATION, REPLICATE_FAILURES):
+        lines.extend(metric.render())
+    lines.extend(_render_cache_stats())
+    return "\n".join(lines) + "\n"
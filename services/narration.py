@@ -0,0 +1,139 @@
+"""
+Pre-generated voice narration for manual steps.
+
+Voice mode reads out each step's description and, when the step has one, its
+orientation popup message. Synthesizing those on demand puts a Kokoro call on
+the user's critical path, so preload_manual_narration() renders them ahead of
+time and stores the audio next to the step images:
+
+  public/manuals/<id>/narration/step<N>.wav              — step description
+  public/manuals/<id>/narration/step<N>_orientation.wav  — orientation message
+  public/manuals/<id>/narration/manifest.json            — text key per file
+
+The manifest records the TTS cache key of the text each file was rendered
+from, so a file is only regenerated when its description or message changes.
+Audio comes from the shared TTS cache (services/tts.py), so narration and
+live /api/tts requests reuse each other's sentence clips.
+
+It only narrates text that already exists (cached descriptions and
+orientation results); it never calls the vision models itself. Enable the
+startup stage with PRELOAD_NARRATION=1.
+"""
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Optional
+
+from . import db as db_helper
+from .db_columns import StepColumn
+from .manual_assets import discover_step_numbers
+from .tts import DEFAULT_VOICE, normalize_text, synthesize_to_file, tts_cache_key
+
+MANUALS_DIR = Path(__file__).resolve().parent.parent / "public" / "manuals"
+NARRATION_DIRNAME = "narration"
+MANIFEST_NAME = "manifest.json"
+
+
+def narration_enabled() -> bool:
+    return os.getenv("PRELOAD_NARRATION", "0") == "1"
+
+
+def _narration_dir(manual_id: int) -> Path:
+    return MANUALS_DIR / str(manual_id) / NARRATION_DIRNAME
+
+
+def _load_manifest(manual_id: int) -> Dict[str, str]:
+    try:
+        with open(_narration_dir(manual_id) / MANIFEST_NAME) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(manual_id: int, manifest: Dict[str, str]) -> None:
+    path = _narration_dir(manual_id) / MANIFEST_NAME
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _orientation_message(manual_id: int, step_number: int) -> Optional[str]:
+    value = db_helper.get_cached_value(manual_id, step_number, StepColumn.ORIENTATION_TEXT, returnMetadata=False)
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return None
+    if isinstance(value, dict) and value.get("show_popup") and value.get("message"):
+        return value["message"]
+    return None
+
+
+def _render(manual_id: int, filename: str, text: str, voice: str, manifest: Dict[str, str]) -> bool:
+    """Render `text` to narration/<filename> unless it is already up to date. Returns True if written."""
+    key = tts_cache_key(normalize_text(text), voice)
+    dest = _narration_dir(manual_id) / filename
+    if manifest.get(filename) == key and dest.exists():
+        return False
+    source = synthesize_to_file(text, voice)
+    tmp = dest.with_suffix(".tmp")
+    shutil.copyfile(source, tmp)
+    os.replace(tmp, dest)
+    manifest[filename] = key
+    return True
+
+
+def preload_manual_narration(manual_id: int, voice: str = DEFAULT_VOICE) -> int:
+    """
+    Synthesize narration audio for every step of a manual that has a cached
+    description (and orientation message, when one should be shown).
+    Continues on per-step errors. Returns the number of files written.
+    """
+    step_numbers = discover_step_numbers(manual_id)
+    if not step_numbers:
+        return 0
+
+    _narration_dir(manual_id).mkdir(parents=True, exist_ok=True)
+    manifest = _load_manifest(manual_id)
+    written = 0
+    print(f"Narration: rendering audio for manual_id = {manual_id}, steps = {step_numbers}")
+    for step_number in step_numbers:
+        try:
+            cached = db_helper.get_cached_value(manual_id, step_number, StepColumn.DESCRIPTION, returnMetadata=False)
+            if cached:
+                written += _render(manual_id, f"step{step_number}.wav", cached, voice, manifest)
+            message = _orientation_message(manual_id, step_number)
+            if message:
+                written += _render(manual_id, f"step{step_number}_orientation.wav", message, voice, manifest)
+        except Exception as e:
+            print(f"Narration: step {step_number} failed: {e}")
+        finally:
+            _save_manifest(manual_id, manifest)
+    print(f"Narration: manual {manual_id} done ({written} file(s) written)")
+    return written
+
+
+def get_narration_urls(manual_id: int) -> Dict[int, Dict[str, str]]:
+    """
+    Return {step_number: {"narration_url": ..., "orientation_narration_url": ...}}
+    for the narration files that exist for a manual.
+    """
+    manifest = _load_manifest(manual_id)
+    if not manifest:
+        return {}
+    base_url = os.getenv("APP_URL", "http://localhost:4000").rstrip("/")
+    urls: Dict[int, Dict[str, str]] = {}
+    for filename in manifest:
+        stem = filename.rsplit(".", 1)[0]
+        field = "narration_url"
+        if stem.endswith("_orientation"):
+            stem = stem[: -len("_orientation")]
+            field = "orientation_narration_url"
+        try:
+            step_number = int(stem[len("step"):])
+        except ValueError:
+            continue
+        urls.setdefault(step_number, {})[field] = f"{base_url}/manuals/{manual_id}/{NARRATION_DIRNAME}/{filename}"
+    return urls
@@ -5,92 +5,347 @@ Compares two step images using GPT-4.1-mini and determines whether the user
 needs to rotate or flip the assembly before proceeding to the next step.
 
 Workflow:
-  start_orientation_generation()  — starts a daemon thread; returns immediately
+  start_orientation_generation()  — queues a job on a bounded worker pool; returns immediately
   _generate_and_store_orientation() — background worker; stores JSON in DB
-  analyze_orientation_change()    — makes the Replicate call; returns
-                                    {show_popup: bool, message: str}
+  analyze_orientation_change()    — local OpenCV prefilter, then (if it is not
+                                    confident) the Replicate call; returns
+                                    {show_popup: bool, message: str}, or None
+                                    when no verdict was obtained
+  get_orientation_queue_status()  — snapshot of queued and running jobs
+  precompute_manual_orientation() — batch: every consecutive step pair of a
+                                    manual, each stored as it completes
+  wait_for_orientation()          — async long-poll for one (manual, from_step) result
+
+Jobs run on a shared ThreadPoolExecutor (ORIENTATION_WORKERS threads) instead of
+one thread per request. A lock-protected registry keyed by
+(manual_id, from_step, to_step) deduplicates in-flight jobs; at most
+ORIENTATION_MAX_QUEUE jobs wait at once (the oldest queued job is dropped to
+make room). When a request carries a client_id, that client's queued jobs for
+the same manual more than ORIENTATION_STALE_DISTANCE steps away are cancelled —
+the user has flipped past them. Other clients' jobs are left alone, so two
+people on the same manual do not cancel each other's work; queued jobs without
+a client_id are dropped once they have waited ORIENTATION_STALE_SECONDS.
+
+precompute_manual_orientation() runs after a manual's steps are preloaded at
+startup and after segmentation, so results are normally cached before the user
+ever reaches a step. Pairs already cached (or in flight on the pool) are
+skipped; the rest are analyzed ORIENTATION_BATCH_CONCURRENCY at a time, and
+each pair is stored (and its waiters woken) as soon as it completes, so an
+on-demand request deduplicated onto the batch does not wait for the whole
+manual. Only real verdicts are stored: when the model call fails (or no token
+is set) nothing is written and the pair is retried on the next request or
+batch, instead of being cached as "no change".
 
 Results are cached in steps.orientation_text (JSONB). The frontend calls
 POST /api/orientation/generate when advancing to a new step (fires-and-forgets),
 then GET /api/orientation/text to retrieve the cached result before actually
 navigating. If generation hasn't finished yet, text is null and navigation
 proceeds without a popup.
+
+Instead of polling /text, clients can call GET /api/orientation/wait, which
+parks on an asyncio future until the result is stored or a timeout passes.
+Every write of ORIENTATION_TEXT in this module resolves the waiters for that
+(manual_id, from_step) from the worker thread via call_soon_threadsafe. The
+notification is in-process, which matches the single-process deployment.
 """
+import asyncio
 import threading
+import time
 import os
 import replicate
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 from services.db_columns import StepColumn
-from services.db import store_value
+from services.db import (
+    db_configured,
+    ensure_manual_and_step,
+    get_cached_value,
+    get_column_for_manual,
+    store_value,
+)
+from services.manual_assets import discover_step_numbers, find_step_image
+from services.replicate_files import open_vision_inputs
+from services.metrics import track_replicate
+from services.orientation_prefilter import classify_transition, prefilter_enabled
 import json
 
-# Global dictionary to track active background tasks
-_background_tasks = {}
-
-BASE_DIR = Path(__file__).resolve().parent.parent
-MANUALS_DIR = BASE_DIR / "public" / "manuals"
-
-
-def _get_step_image_path(manual_id: int = 1, step_number: int = None):
-    """
-    Helper to get local file path for a given step.
-    Looks under public/manuals/<manual_id>/ for step<N>.png or step<N>.jpg.
-    """
-    manual_dir = MANUALS_DIR / str(manual_id)
-    for ext in (".png", ".jpg"):
-        image_path = manual_dir / f"step{step_number}{ext}"
-        if image_path.exists():
-            return image_path
-    raise FileNotFoundError(f"Step image not found: {manual_dir}/step{step_number}.png|.jpg")
-
-def start_orientation_generation(manual_id: int, from_step: int, to_step: int) -> None:
+ORIENTATION_WORKERS = int(os.getenv("ORIENTATION_WORKERS", "2"))
+ORIENTATION_MAX_QUEUE = int(os.getenv("ORIENTATION_MAX_QUEUE", "16"))
+ORIENTATION_BATCH_CONCURRENCY = int(os.getenv("ORIENTATION_BATCH_CONCURRENCY", "4"))
+# Queued jobs further than this many steps from the same client's latest request are stale
+ORIENTATION_STALE_DISTANCE = 2
+# Queued jobs without a client_id are stale after waiting this long
+ORIENTATION_STALE_SECONDS = int(os.getenv("ORIENTATION_STALE_SECONDS", "60"))
+
+_executor = ThreadPoolExecutor(max_workers=ORIENTATION_WORKERS, thread_name_prefix="orientation")
+
+# (manual_id, from_step, to_step) -> {"state": "queued"|"running", "future", "client_id", "submitted_at", "started_at"}
+_jobs: Dict[Tuple[int, int, int], dict] = {}
+_jobs_lock = threading.Lock()
+
+# (manual_id, from_step) -> [(event loop, asyncio.Future)] parked in wait_for_orientation()
+_waiters: Dict[Tuple[int, int], List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+_waiters_lock = threading.Lock()
+
+
+def _cancel_locked(key: Tuple[int, int, int]) -> bool:
+    """Cancel a queued job (caller holds _jobs_lock). Running jobs cannot be cancelled."""
+    job = _jobs.get(key)
+    if job is None or job["state"] != "queued" or not job["future"].cancel():
+        return False
+    del _jobs[key]
+    return True
+
+
+def _cancel_stale_locked(manual_id: int, from_step: int, client_id: Optional[str]) -> None:
+    now = time.time()
+    for key, job in list(_jobs.items()):
+        if job["state"] != "queued":
+            continue
+        if job.get("client_id") is None:
+            stale = now - job["submitted_at"] > ORIENTATION_STALE_SECONDS
+        else:
+            stale = (
+                job["client_id"] == client_id
+                and key[0] == manual_id
+                and abs(key[1] - from_step) > ORIENTATION_STALE_DISTANCE
+            )
+        if stale and _cancel_locked(key):
+            print(f"Cancelled stale orientation job {key}")
+
+
+def start_orientation_generation(
+    manual_id: int, from_step: int, to_step: int, client_id: Optional[str] = None
+) -> str:
     """
-    Start background orientation text generation.
+    Queue background orientation text generation.
     Non-blocking - returns immediately while analysis runs in background.
+    client_id identifies the viewer session; only that session's own queued
+    jobs are cancelled as stale when it moves on.
+
+    Returns "started" for a newly queued job, "queued"/"running" if the same
+    transition is already in flight, or "rejected" if the queue is full of jobs
+    that cannot be dropped.
     """
-    key = f"{manual_id}:{from_step}"
-    
-    # Don't start if already running
-    if key in _background_tasks:
-        return
-    
-    # Start background thread
-    thread = threading.Thread(
-        target=_generate_and_store_orientation,
-        args=(manual_id, from_step, to_step),
-        daemon=True
-    )
-    _background_tasks[key] = thread
-    thread.start()
+    key = (manual_id, from_step, to_step)
+    with _jobs_lock:
+        existing = _jobs.get(key)
+        if existing is not None:
+            return existing["state"]
+
+        _cancel_stale_locked(manual_id, from_step, client_id)
+
+        queued = sorted(
+            (job["submitted_at"], k) for k, job in _jobs.items() if job["state"] == "queued"
+        )
+        while len(queued) >= ORIENTATION_MAX_QUEUE:
+            _, oldest = queued.pop(0)
+            if not _cancel_locked(oldest):
+                return "rejected"
+            print(f"Dropped oldest queued orientation job {oldest}")
+
+        job = {"state": "queued", "client_id": client_id, "submitted_at": time.time(), "started_at": None}
+        _jobs[key] = job
+        job["future"] = _executor.submit(_run_job, key)
+    return "started"
+
+
+def _run_job(key: Tuple[int, int, int]) -> None:
+    with _jobs_lock:
+        job = _jobs.get(key)
+        if job is None:
+            return
+        job["state"] = "running"
+        job["started_at"] = time.time()
+    try:
+        _generate_and_store_orientation(*key)
+    finally:
+        with _jobs_lock:
+            _jobs.pop(key, None)
+
+
+def get_orientation_queue_status() -> dict:
+    """Return the queued and running orientation jobs with their ages in seconds."""
+    now = time.time()
+    queued, running = [], []
+    with _jobs_lock:
+        for (manual_id, from_step, to_step), job in _jobs.items():
+            entry = {
+                "manual_id": manual_id,
+                "from_step": from_step,
+                "to_step": to_step,
+                "queued_seconds": round((job["started_at"] or now) - job["submitted_at"], 2),
+            }
+            if job["state"] == "running":
+                entry["running_seconds"] = round(now - job["started_at"], 2)
+                running.append(entry)
+            else:
+                queued.append(entry)
+    return {
+        "workers": ORIENTATION_WORKERS,
+        "max_queue": ORIENTATION_MAX_QUEUE,
+        "running": running,
+        "queued": queued,
+    }
 
 
 def _generate_and_store_orientation(manual_id: int, from_step: int, to_step: int) -> None:
     """
     Background worker: Generate orientation text and store in database.
-    This runs in a separate thread.
+    This runs on the orientation worker pool.
     """
     try:
         # Get image URLs
-        current_image_path = _get_step_image_path(manual_id, from_step)
-        next_image_path = _get_step_image_path(manual_id, to_step)
+        current_image_path = find_step_image(manual_id, from_step)
+        next_image_path = find_step_image(manual_id, to_step)
         
         # Run orientation analysis
         result = analyze_orientation_change(current_image_path, next_image_path)
+        if result is None:
+            # No verdict (model call failed): leave it uncached so it is retried
+            print(f"No orientation verdict for manual {manual_id}, step {from_step}; not caching")
+            return
         
         # Store as JSON string in database
         orientation_json = json.dumps(result)
         store_value(manual_id, from_step, StepColumn.ORIENTATION_TEXT, orientation_json)
+        # Waiters get the decoded object, the same shape the JSONB cache read returns
+        _notify_waiters(manual_id, from_step, result)
         
         print(f"Stored orientation text for manual {manual_id}, step {from_step}: {result}")
         
     except Exception as e:
         print(f"Error generating orientation text: {e}")
+
+
+def _resolve(future: asyncio.Future, value) -> None:
+    if not future.done():
+        future.set_result(value)
+
+
+def _notify_waiters(manual_id: int, from_step: int, value) -> None:
+    """Wake every wait_for_orientation() call parked on (manual_id, from_step)."""
+    with _waiters_lock:
+        waiters = _waiters.pop((manual_id, from_step), [])
+    for loop, future in waiters:
+        loop.call_soon_threadsafe(_resolve, future, value)
+
+
+async def wait_for_orientation(manual_id: int, from_step: int, timeout: float):
+    """
+    Return the orientation result for (manual_id, from_step) as a decoded
+    {"show_popup", "message"} object, waiting up to `timeout` seconds for it
+    to be stored. Returns None on timeout.
+    """
+    key = (manual_id, from_step)
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    # Register before reading the cache so a write in between is not missed
+    with _waiters_lock:
+        _waiters.setdefault(key, []).append((loop, future))
+    try:
+        cached = await asyncio.to_thread(
+            get_cached_value, manual_id, from_step, StepColumn.ORIENTATION_TEXT, False
+        )
+        if cached:
+            return cached
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        return None
+    finally:
+        with _waiters_lock:
+            waiters = _waiters.get(key)
+            if waiters and (loop, future) in waiters:
+                waiters.remove((loop, future))
+                if not waiters:
+                    del _waiters[key]
+
+
+def precompute_enabled() -> bool:
+    return os.getenv("PRECOMPUTE_ORIENTATION", "1") == "1"
+
+
+def _analyze_pair(manual_id: int, from_step: int, to_step: int) -> Optional[Dict[str, str]]:
+    try:
+        return analyze_orientation_change(
+            find_step_image(manual_id, from_step),
+            find_step_image(manual_id, to_step),
+        )
+    except FileNotFoundError as e:
+        print(f"Orientation batch: {e}")
+        return None
+
+
+def precompute_manual_orientation(manual_id: int) -> int:
+    """
+    Analyze every consecutive step pair of a manual that has no cached
+    orientation text, storing each result as it completes.
+    Returns the number of transitions written.
+    """
+    if not os.getenv("REPLICATE_API_TOKEN"):
+        print(f"Orientation batch: REPLICATE_API_TOKEN not set, skipping manual {manual_id}")
+        return 0
+    if not db_configured():
+        # Results could not be stored, so every restart would pay for the same model calls
+        print(f"Orientation batch: database not configured, skipping manual {manual_id}")
+        return 0
+
+    step_numbers = discover_step_numbers(manual_id)
+    cached = get_column_for_manual(manual_id, StepColumn.ORIENTATION_TEXT)
+    now = time.time()
+    with _jobs_lock:
+        pending = [
+            (from_step, to_step)
+            for from_step, to_step in zip(step_numbers, step_numbers[1:])
+            if from_step not in cached and (manual_id, from_step, to_step) not in _jobs
+        ]
+        # Register as running so on-demand requests for these pairs are deduplicated
+        for from_step, to_step in pending:
+            _jobs[(manual_id, from_step, to_step)] = {
+                "state": "running", "future": None, "submitted_at": now, "started_at": now,
+            }
+
+    if not pending:
+        return 0
+
+    print(f"Orientation batch: manual {manual_id}, {len(pending)} transition(s)")
+    stored = 0
+    try:
+        # store_value only UPDATEs, so make sure every from_step has a steps row
+        base_url = os.getenv("APP_URL", "http://localhost:4000").rstrip("/")
+        for from_step, _ in pending:
+            try:
+                image_path = find_step_image(manual_id, from_step)
+            except FileNotFoundError:
+                continue
+            ensure_manual_and_step(manual_id, from_step, f"{base_url}/manuals/{manual_id}/{image_path.name}")
+        with ThreadPoolExecutor(
+            max_workers=ORIENTATION_BATCH_CONCURRENCY, thread_name_prefix="orientation-batch"
+        ) as pool:
+            futures = {
+                pool.submit(_analyze_pair, manual_id, from_step, to_step): (from_step, to_step)
+                for from_step, to_step in pending
+            }
+            for future in as_completed(futures):
+                from_step, to_step = futures[future]
+                try:
+                    result = future.result()
+                    if result is not None:
+                        store_value(manual_id, from_step, StepColumn.ORIENTATION_TEXT, json.dumps(result))
+                        _notify_waiters(manual_id, from_step, result)
+                        stored += 1
+                finally:
+                    # Release the pair so later requests are not deduplicated onto a finished job
+                    with _jobs_lock:
+                        _jobs.pop((manual_id, from_step, to_step), None)
     finally:
-        # Clean up task tracking
-        key = f"{manual_id}:{from_step}"
-        if key in _background_tasks:
-            del _background_tasks[key]
+        with _jobs_lock:
+            for from_step, to_step in pending:
+                _jobs.pop((manual_id, from_step, to_step), None)
+
+    print(f"Orientation batch: manual {manual_id} done ({stored} stored)")
+    return stored
 
 
 # -----------------------------------------------
@@ -132,42 +387,59 @@ If an orientation change IS required, return:
 def analyze_orientation_change(
     current_image_path: Path,
     next_image_path: Path,
-) -> Dict[str, str]:
+    use_prefilter: bool = True,
+) -> Optional[Dict[str, str]]:
+    """
+    Compare two step images. The local prefilter answers confident cases
+    (services/orientation_prefilter.py); the rest go to the vision model.
+    Returns None when there is no verdict (no REPLICATE_API_TOKEN, the call
+    failed, or the response was not a JSON object), so callers can avoid
+    caching a fallback as if it were an answer.
+    """
 
     safe_default = {"show_popup": False, "message": ""}
 
+    if use_prefilter and prefilter_enabled():
+        verdict = classify_transition(current_image_path, next_image_path)
+        if verdict["result"] is not None:
+            print(
+                f"Orientation prefilter: {verdict['decision']} "
+                f"({verdict['method']}, {verdict['inliers']} inliers, {verdict['angle']}°), skipping model"
+            )
+            return verdict["result"]
+
     if not os.getenv("REPLICATE_API_TOKEN"):
-        return safe_default
+        return None
 
     response_parts = []
 
     try:
-        with open(current_image_path, "rb") as cur_img, open(next_image_path, "rb") as nxt_img:
+        with open_vision_inputs(current_image_path, next_image_path) as image_input, track_replicate("orientation", MODEL):
             input_data = {
                 "system_prompt": SYSTEM_PROMPT,
                 "prompt": PROMPT,
-                "image_input": [cur_img, nxt_img],
+                "image_input": image_input,
                 "max_output_tokens": 200,
             }
             for event in replicate.stream(MODEL, input=input_data):
                 response_parts.append(str(event))
     except Exception as e:
         print(f"Warning: replicate call failed: {e}")
-        return safe_default
+        return None
 
     response_text = "".join(response_parts).strip()
 
     # Hard safety checks
     if not response_text or not response_text.startswith("{"):
-        return safe_default
+        return None
 
     try:
         result = json.loads(response_text)
     except json.JSONDecodeError:
-        return safe_default
+        return None
 
     if not isinstance(result, dict):
-        return safe_default
+        return None
 
     show_popup = bool(result.get("show_popup", False))
     message = result.get("message", "")
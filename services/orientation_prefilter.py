@@ -0,0 +1,219 @@
+"""
+Local OpenCV prefilter for orientation change detection.
+
+Most consecutive steps show the assembly from the same viewpoint, yet every
+transition used to pay for a GPT-4.1-mini vision call. classify_transition()
+runs first and estimates how the shared parts of the drawing moved between
+the two step images:
+
+  1. ORB features are matched between the images (Lowe ratio test) and a
+     rotation + uniform scale + translation model is fitted with RANSAC
+     (cv2.estimateAffinePartial2D). Enough inliers with a near-zero angle means
+     "unchanged"; a large angle means "rotated".
+  2. The same matching against the horizontally mirrored next image detects
+     a flip (ORB descriptors are rotation- but not mirror-invariant).
+  3. When the feature fit is weak but its inliers still agree on a
+     near-zero angle, gradient-orientation histograms of the two images are
+     compared as a second opinion. The histogram alone cannot tell a 180°
+     turn or a mirror flip from no change, so it never decides on its own.
+
+Anything else is "uncertain" and goes to the model. Confident decisions carry
+a result in the model's {show_popup, message} shape, so callers can skip the
+remote call. Set ORIENTATION_PREFILTER=0 to always call the model;
+scripts/eval_orientation_prefilter.py compares the decisions against cached
+model outputs.
+"""
+import math
+import os
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+
+try:
+    import cv2
+    import numpy as np
+except Exception:
+    cv2 = None
+    np = None
+
+# Images are compared at this size; line drawings keep their features well
+PREFILTER_MAX_SIDE = 800
+ORB_FEATURES = 1500
+RATIO_TEST = 0.75
+RANSAC_REPROJ_THRESHOLD = 5.0
+
+MIN_INLIERS = int(os.getenv("ORIENTATION_PREFILTER_MIN_INLIERS", "25"))
+MIN_INLIER_RATIO = 0.35
+# |angle| at or below this is "unchanged"; at or above ROTATION_MIN_DEG is "rotated"
+ANGLE_TOLERANCE_DEG = 10.0
+ROTATION_MIN_DEG = 60.0
+# A flip needs this many times more inliers against the mirrored image
+FLIP_INLIER_FACTOR = 2.0
+
+EDGE_BINS = 36
+# Feature inliers (at |angle| <= ANGLE_TOLERANCE_DEG) the edge check needs before it may confirm "unchanged"
+EDGE_MIN_FEATURE_INLIERS = 12
+EDGE_MIN_CORRELATION = 0.95
+EDGE_MIN_MARGIN = 0.25
+
+UNCHANGED = "unchanged"
+ROTATED = "rotated"
+FLIPPED = "flipped"
+UNCERTAIN = "uncertain"
+
+_stats = {decision: 0 for decision in (UNCHANGED, ROTATED, FLIPPED, UNCERTAIN)}
+_stats_lock = threading.Lock()
+
+
+def prefilter_enabled() -> bool:
+    return cv2 is not None and os.getenv("ORIENTATION_PREFILTER", "1") == "1"
+
+
+def _load_gray(path: Path) -> Optional["np.ndarray"]:
+    image = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return None
+    scale = PREFILTER_MAX_SIDE / max(image.shape[:2])
+    if scale < 1:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return image
+
+
+def _features(image: "np.ndarray"):
+    return cv2.ORB_create(nfeatures=ORB_FEATURES).detectAndCompute(image, None)
+
+
+def _fit_motion(features_a, features_b) -> Tuple[int, float, float]:
+    """
+    Match two feature sets and fit a similarity transform.
+    Returns (inliers, inlier_ratio, angle in degrees; positive = clockwise on screen).
+    """
+    keypoints_a, descriptors_a = features_a
+    keypoints_b, descriptors_b = features_b
+    if descriptors_a is None or descriptors_b is None or len(keypoints_a) < 2 or len(keypoints_b) < 2:
+        return 0, 0.0, 0.0
+
+    matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+    good = [
+        pair[0]
+        for pair in matcher.knnMatch(descriptors_a, descriptors_b, k=2)
+        if len(pair) == 2 and pair[0].distance < RATIO_TEST * pair[1].distance
+    ]
+    if len(good) < MIN_INLIERS:
+        return 0, 0.0, 0.0
+
+    src = np.float32([keypoints_a[m.queryIdx].pt for m in good]).reshape(-1, 1, 2)
+    dst = np.float32([keypoints_b[m.trainIdx].pt for m in good]).reshape(-1, 1, 2)
+    matrix, mask = cv2.estimateAffinePartial2D(
+        src, dst, method=cv2.RANSAC, ransacReprojThreshold=RANSAC_REPROJ_THRESHOLD
+    )
+    if matrix is None or mask is None:
+        return 0, 0.0, 0.0
+    inliers = int(mask.sum())
+    angle = math.degrees(math.atan2(matrix[1, 0], matrix[0, 0]))
+    return inliers, inliers / len(good), angle
+
+
+def _edge_histogram(image: "np.ndarray") -> "np.ndarray":
+    """Magnitude-weighted histogram of gradient orientations (mod 180°), L2-normalized."""
+    gx = cv2.Sobel(image, cv2.CV_32F, 1, 0, ksize=3)
+    gy = cv2.Sobel(image, cv2.CV_32F, 0, 1, ksize=3)
+    magnitude, angle = cv2.cartToPolar(gx, gy, angleInDegrees=True)
+    hist, _ = np.histogram(angle % 180, bins=EDGE_BINS, range=(0, 180), weights=magnitude)
+    norm = np.linalg.norm(hist)
+    return hist / norm if norm else hist
+
+
+def _edges_unchanged(image_a: "np.ndarray", image_b: "np.ndarray") -> bool:
+    hist_a, hist_b = _edge_histogram(image_a), _edge_histogram(image_b)
+    aligned = float(np.dot(hist_a, hist_b))
+    quarter_turn = float(np.dot(hist_a, np.roll(hist_b, EDGE_BINS // 2)))
+    return aligned >= EDGE_MIN_CORRELATION and aligned - quarter_turn >= EDGE_MIN_MARGIN
+
+
+def _rotation_message(angle: float) -> str:
+    degrees = int(round(abs(angle) / 90.0)) * 90 or 90
+    if degrees >= 180:
+        return "Turn the assembly around 180° so it matches the next step."
+    direction = "clockwise" if angle > 0 else "counterclockwise"
+    return f"Rotate the assembly {degrees}° {direction} so it matches the next step."
+
+
+def _decision(decision: str, method: Optional[str], inliers: int, angle: float) -> dict:
+    result = None
+    if decision == UNCHANGED:
+        result = {"show_popup": False, "message": ""}
+    elif decision == ROTATED:
+        result = {"show_popup": True, "message": _rotation_message(angle)}
+    elif decision == FLIPPED:
+        result = {
+            "show_popup": True,
+            "message": "Flip the assembly over so it faces the opposite way, as shown in the next step.",
+        }
+    with _stats_lock:
+        _stats[decision] += 1
+    return {
+        "decision": decision,
+        "method": method,
+        "inliers": inliers,
+        "angle": round(angle, 1),
+        "result": result,
+    }
+
+
+def classify_transition(current_image_path: Path, next_image_path: Path) -> dict:
+    """
+    Estimate the orientation change between two step images.
+
+    Returns {"decision": unchanged|rotated|flipped|uncertain, "method":
+    "features"|"edges"|None, "inliers", "angle", "result"}, where "result" is
+    a {show_popup, message} dict for confident decisions and None otherwise.
+    Never raises.
+    """
+    try:
+        image_a = _load_gray(current_image_path)
+        image_b = _load_gray(next_image_path)
+        if image_a is None or image_b is None:
+            return _decision(UNCERTAIN, None, 0, 0.0)
+
+        features_a = _features(image_a)
+        inliers, ratio, angle = _fit_motion(features_a, _features(image_b))
+        confident = inliers >= MIN_INLIERS and ratio >= MIN_INLIER_RATIO
+
+        flip_inliers, flip_ratio, flip_angle = _fit_motion(features_a, _features(cv2.flip(image_b, 1)))
+        if (
+            flip_inliers >= MIN_INLIERS
+            and flip_ratio >= MIN_INLIER_RATIO
+            and flip_inliers >= FLIP_INLIER_FACTOR * max(inliers, 1)
+            and abs(flip_angle) <= ANGLE_TOLERANCE_DEG
+        ):
+            return _decision(FLIPPED, "features", flip_inliers, flip_angle)
+
+        if confident:
+            if abs(angle) <= ANGLE_TOLERANCE_DEG:
+                return _decision(UNCHANGED, "features", inliers, angle)
+            if abs(angle) >= ROTATION_MIN_DEG:
+                return _decision(ROTATED, "features", inliers, angle)
+            return _decision(UNCERTAIN, "features", inliers, angle)
+
+        # Edges are only a second opinion: the weak feature fit must still point at ~0°
+        # and not lean towards the mirrored image, since histograms cannot see 180° or flips
+        if (
+            inliers >= EDGE_MIN_FEATURE_INLIERS
+            and abs(angle) <= ANGLE_TOLERANCE_DEG
+            and flip_inliers < inliers
+            and _edges_unchanged(image_a, image_b)
+        ):
+            return _decision(UNCHANGED, "edges", inliers, angle)
+        return _decision(UNCERTAIN, None, inliers, angle)
+    except Exception as e:
+        print(f"Warning: orientation prefilter failed: {e}")
+        return _decision(UNCERTAIN, None, 0, 0.0)
+
+
+def get_prefilter_stats() -> dict:
+    """Return how many transitions were decided locally vs sent to the model."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["enabled"] = prefilter_enabled()
+    return stats
@@ -0,0 +1,162 @@
+"""
+Upload-once file references for repeated vision model inputs.
+
+The same step images are sent to Replicate by chat, lasso, orientation and
+explanation calls. Passing an open file handle makes the client re-upload the
+bytes on every prediction. This module uploads each (prepared) image once via
+Replicate's file API and hands out the returned URL until it expires.
+
+Public API:
+  get_file_reference(path) — remote URL for a local file, uploading on miss
+  vision_input(path)       — prepared image as a URL, or an open file if the
+                             upload cache is unavailable
+  open_vision_inputs(*paths) — context manager yielding a list of inputs and
+                               closing any file handles afterwards
+
+References are keyed by the file's content hash, so the same image reached
+through different paths shares one upload. Entries are dropped REFERENCE_SAFETY_MARGIN
+seconds before their expiry and re-uploaded on the next use. Set
+REPLICATE_FILE_CACHE=0 to disable and always send file handles.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import replicate
+
+from .image_prep import file_digest, prepare_image
+from .metrics import track_replicate
+
+# Used when the API response does not include an expiry timestamp
+DEFAULT_REFERENCE_TTL = int(os.getenv("REPLICATE_FILE_TTL", "3600"))
+# Stop handing out a reference this many seconds before it expires
+REFERENCE_SAFETY_MARGIN = 300
+
+# content digest -> (remote url, expires_at epoch seconds)
+_references: Dict[str, Tuple[str, float]] = {}
+# (path, mtime_ns, size) -> content digest
+_digests: Dict[Tuple[str, int, int], str] = {}
+_lock = threading.Lock()
+# Fixed pool of upload locks, striped by digest, so the lock table never grows
+UPLOAD_LOCK_STRIPES = 64
+_upload_locks = [threading.Lock() for _ in range(UPLOAD_LOCK_STRIPES)]
+
+_stats = {"hits": 0, "uploads": 0, "expired": 0, "failures": 0}
+
+
+def _enabled() -> bool:
+    return os.getenv("REPLICATE_FILE_CACHE", "1") != "0" and bool(os.getenv("REPLICATE_API_TOKEN"))
+
+
+def _parse_expiry(value: Any) -> float:
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str) and value:
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            pass
+    return time.time() + DEFAULT_REFERENCE_TTL
+
+
+def _digest_for(path: Path) -> str:
+    st = path.stat()
+    key = (str(path), st.st_mtime_ns, st.st_size)
+    with _lock:
+        digest = _digests.get(key)
+    if digest is None:
+        digest = file_digest(path)
+        with _lock:
+            _digests[key] = digest
+    return digest
+
+
+def get_file_reference(path: Path) -> Optional[str]:
+    """
+    Return a Replicate file URL for the local file at `path`, uploading it if
+    there is no unexpired reference yet. Returns None if the cache is disabled
+    or the upload fails.
+    """
+    if not _enabled():
+        return None
+
+    path = Path(path)
+    try:
+        digest = _digest_for(path)
+    except OSError:
+        return None
+
+    # Serialize uploads per file so concurrent callers share one upload
+    with _upload_locks[int(digest[:8], 16) % UPLOAD_LOCK_STRIPES]:
+        with _lock:
+            entry = _references.get(digest)
+        if entry is not None:
+            url, expires_at = entry
+            if time.time() < expires_at - REFERENCE_SAFETY_MARGIN:
+                _stats["hits"] += 1
+                return url
+            _stats["expired"] += 1
+
+        try:
+            with open(path, "rb") as f, track_replicate("replicate_files", "files.create"):
+                uploaded = replicate.files.create(f)
+            url = uploaded.urls["get"]
+            expires_at = _parse_expiry(getattr(uploaded, "expires_at", None))
+        except Exception as e:
+            _stats["failures"] += 1
+            print(f"[ReplicateFiles] Upload failed for {path.name}: {e}")
+            return None
+
+        with _lock:
+            _references[digest] = (url, expires_at)
+        _stats["uploads"] += 1
+        print(f"[ReplicateFiles] Uploaded {path.name} -> {url}")
+        return url
+
+
+def vision_input(path: Path) -> Any:
+    """
+    Return the value to place in a vision model's `image_input` for a local
+    image: a cached remote URL when possible, otherwise an open file handle
+    the caller must close.
+    """
+    prepared = prepare_image(path)
+    url = get_file_reference(prepared)
+    if url:
+        return url
+    return open(prepared, "rb")
+
+
+def close_inputs(inputs: List[Any]) -> None:
+    """Close any file handles in a list returned by vision_input()."""
+    for item in inputs:
+        if hasattr(item, "close"):
+            try:
+                item.close()
+            except Exception:
+                pass
+
+
+@contextmanager
+def open_vision_inputs(*paths: Path):
+    """Yield vision inputs for `paths`, closing any opened files on exit."""
+    inputs: List[Any] = []
+    try:
+        for path in paths:
+            inputs.append(vision_input(path))
+        yield inputs
+    finally:
+        close_inputs(inputs)
+
+
+def get_file_reference_stats() -> dict:
+    """Return upload cache counters."""
+    stats = dict(_stats)
+    with _lock:
+        stats["cached_references"] = len(_references)
+    stats["enabled"] = _enabled()
+    return stats
@@ -0,0 +1,117 @@
+"""
+Static file serving with content validators and cache policy.
+
+AssetStaticFiles replaces StaticFiles for the asset mounts (/manuals,
+/lasso_screenshots, /tts_audio). Every file response carries:
+
+  - a strong ETag derived from the file's content (SHA-256), instead of
+    Starlette's mtime/size digest, so identical bytes validate identically
+    across deploys and re-ingestion that rewrites unchanged files
+  - Last-Modified (from Starlette), with If-None-Match / If-Modified-Since
+    answered by 304 Not Modified
+  - Cache-Control: immutable and one year long when the URL carries
+    ?v=<asset_version> matching the current content, otherwise
+    ASSET_MAX_AGE seconds (revalidated with the validators above)
+
+asset_version() / versioned_url() build those content-hashed URLs; the
+steps listing uses them for step images. Hashes are memoized per
+(path, mtime, size), so each file is read once per change, and served
+files are hashed in StaticFiles' lookup thread, off the event loop.
+
+Bodies are sent by RangeFileResponse (services/asset_serving.py): byte
+ranges, zero-copy when the server supports it, chunked reads, or an
+X-Accel-Redirect style header when SENDFILE_HEADER is set.
+"""
+import hashlib
+import os
+import stat
+import threading
+from pathlib import Path
+from typing import Dict, Tuple
+from urllib.parse import parse_qs
+
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from .asset_serving import SENDFILE_HEADER, RangeFileResponse, sendfile_enabled, sendfile_location
+
+ASSET_MAX_AGE = int(os.getenv("ASSET_MAX_AGE", "3600"))
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+VERSION_LENGTH = 12
+
+# (path, mtime_ns, size) -> sha256 hex digest
+_digests: Dict[Tuple[str, int, int], str] = {}
+_digests_lock = threading.Lock()
+
+
+def content_digest(path: Path, stat_result: os.stat_result = None) -> str:
+    """SHA-256 of a file's content, memoized by (path, mtime, size)."""
+    st = stat_result or os.stat(path)
+    key = (str(path), st.st_mtime_ns, st.st_size)
+    with _digests_lock:
+        digest = _digests.get(key)
+    if digest is not None:
+        return digest
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _digests_lock:
+        _digests[key] = digest
+    return digest
+
+
+def asset_version(path: Path) -> str:
+    """Short content hash used as the ?v= cache-busting parameter."""
+    return content_digest(path)[:VERSION_LENGTH]
+
+
+def versioned_url(url: str, path: Path) -> str:
+    """Append ?v=<content hash> to the URL of a local asset (unchanged if the file is missing)."""
+    try:
+        version = asset_version(path)
+    except OSError:
+        return url
+    separator = "&" if "?" in url else "?"
+    return f"{url}{separator}v={version}"
+
+
+class AssetStaticFiles(StaticFiles):
+    """StaticFiles with content-hash ETags and version-aware Cache-Control."""
+
+    def lookup_path(self, path: str):
+        # StaticFiles.get_response runs lookup_path in a worker thread; hash
+        # there so file_response only reads the memoized digest on the event loop
+        full_path, stat_result = super().lookup_path(path)
+        if stat_result is not None and stat.S_ISREG(stat_result.st_mode):
+            try:
+                content_digest(Path(full_path), stat_result)
+            except OSError:
+                pass
+        return full_path, stat_result
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        response = RangeFileResponse(full_path, stat_result=stat_result, status_code=status_code)
+        digest = content_digest(Path(full_path), stat_result)
+        response.headers["etag"] = f'"{digest[:32]}"'
+
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        if query.get("v", [""])[0] == digest[:VERSION_LENGTH]:
+            response.headers["cache-control"] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers["cache-control"] = f"public, max-age={ASSET_MAX_AGE}"
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        if sendfile_enabled():
+            # The reverse proxy serves the body (and ranges); forward our validators and cache policy
+            headers = {
+                k: v for k, v in response.headers.items()
+                if k in ("etag", "last-modified", "cache-control", "content-type", "accept-ranges")
+            }
+            headers[SENDFILE_HEADER] = sendfile_location(full_path)
+            return Response(status_code=status_code, headers=headers)
+        return response
@@ -16,6 +16,7 @@ from typing import List
 from dotenv import load_dotenv
 
 from .text_extraction import get_step_explanation
+from .metrics import track_replicate
 
 load_dotenv()
 
@@ -79,11 +80,12 @@ def generate_checklist(manual_id: int, step_number: int) -> dict:
     # Call GPT-4o via Replicate
     response_parts = []
     try:
-        for event in replicate.stream(
-            "openai/gpt-4o",
-            input={"prompt": prompt}
-        ):
-            response_parts.append(str(event))
+        with track_replicate("step_checklist", "openai/gpt-4o"):
+            for event in replicate.stream(
+                "openai/gpt-4o",
+                input={"prompt": prompt}
+            ):
+                response_parts.append(str(event))
     except Exception as e:
         print(f"Warning: replicate call failed: {e}")
         raise ValueError(f"Failed to generate checklist: {e}")
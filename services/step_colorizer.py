@@ -18,6 +18,7 @@ from dotenv import load_dotenv
 
 from .db import get_cached_value, get_product_image_url
 from .db_columns import StepColumn
+from .metrics import track_replicate
 
 load_dotenv()
 
@@ -75,7 +76,8 @@ def colorize_with_replicate(colored_image_path: str, diagram_path: str, prompt:
         }
         
         print(f"Running model {COLORIZER_MODEL}...")
-        output = replicate.run(COLORIZER_MODEL, input=input_data)
+        with track_replicate("step_colorizer", COLORIZER_MODEL):
+            output = replicate.run(COLORIZER_MODEL, input=input_data)
         
         # Handle different output formats
         if hasattr(output, 'url'):
@@ -0,0 +1,174 @@
+"""
+Per-manual thumbnail sprite sheet for the step navigator rail.
+
+The rail draws a thumbnail of every step, which used to mean one image request
+per step (25 for manual 2). get_step_sprite() packs a low-res thumbnail of
+each step into a single image plus a coordinate map:
+
+  {"manual_id", "version", "image_url", "format", "width", "height",
+   "cell": {"width", "height"},
+   "steps": [{"step_number", "x", "y", "w", "h"}, ...]}
+
+Thumbnails keep their aspect ratio, fit inside SPRITE_CELL_SIZE and are
+centered in a grid of SPRITE_COLUMNS columns on white (diagrams are drawn on
+white); x/y/w/h give the exact thumbnail rectangle inside the sheet, so the
+frontend can use them as CSS background-position/size.
+
+Sprites live in cache/step_sprites/, named by manual and a signature of the
+step images (step number, size, mtime from services/manual_assets.py). A
+changed, added or removed step gives a new signature, so the sheet is rebuilt
+on the next request and image_url (?v=<signature>) changes with it. The
+sheet is built eagerly after segmentation; requires Pillow.
+"""
+import hashlib
+import json
+import math
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from .image_prep import Image, encode_image, flatten_to_rgb
+from .manual_assets import get_step_assets
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+SPRITE_CACHE_DIR = BASE_DIR / "cache" / "step_sprites"
+
+SPRITE_CELL_SIZE = (160, 120)
+SPRITE_COLUMNS = 5
+SPRITE_QUALITY = 80
+
+# manual_id -> (signature, sprite map)
+_sprites: Dict[int, Tuple[str, dict]] = {}
+_sprites_lock = threading.Lock()
+_build_lock = threading.Lock()
+
+_stats = {"builds": 0, "hits": 0}
+
+
+def sprite_format() -> str:
+    return "webp" if Image is not None and ".webp" in Image.registered_extensions() else "png"
+
+
+def _signature(assets: Dict[int, dict]) -> str:
+    parts = [f"{n}:{a['path'].name}:{a['size']}:{a['mtime']}" for n, a in assets.items()]
+    parts.append(f"{SPRITE_CELL_SIZE}:{SPRITE_COLUMNS}:{SPRITE_QUALITY}")
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()[:16]
+
+
+def sprite_path(manual_id: int, signature: str, fmt: str) -> Path:
+    ext = ".webp" if fmt == "webp" else ".png"
+    return SPRITE_CACHE_DIR / f"{manual_id}_{signature}{ext}"
+
+
+def _sprite_url(manual_id: int, signature: str) -> str:
+    base_url = os.getenv("APP_URL", "http://localhost:4000").rstrip("/")
+    return f"{base_url}/api/manuals/{manual_id}/sprite/image?v={signature}"
+
+
+def _build(manual_id: int, assets: Dict[int, dict], signature: str) -> dict:
+    cell_w, cell_h = SPRITE_CELL_SIZE
+    columns = min(SPRITE_COLUMNS, len(assets))
+    rows = math.ceil(len(assets) / columns)
+    sheet = Image.new("RGB", (columns * cell_w, rows * cell_h), (255, 255, 255))
+
+    steps = []
+    for index, (step_number, asset) in enumerate(assets.items()):
+        col, row = index % columns, index // columns
+        with Image.open(asset["path"]) as img:
+            img.draft("RGB", SPRITE_CELL_SIZE)
+            thumb = flatten_to_rgb(img)
+            thumb.thumbnail(SPRITE_CELL_SIZE, Image.LANCZOS)
+        x = col * cell_w + (cell_w - thumb.width) // 2
+        y = row * cell_h + (cell_h - thumb.height) // 2
+        sheet.paste(thumb, (x, y))
+        steps.append({"step_number": step_number, "x": x, "y": y, "w": thumb.width, "h": thumb.height})
+
+    fmt = sprite_format()
+    dest = sprite_path(manual_id, signature, fmt)
+    SPRITE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f"{dest.name}.{threading.get_ident()}.tmp")
+    if fmt == "webp":
+        encode_image(sheet, tmp, fmt, SPRITE_QUALITY)
+    else:
+        sheet.save(tmp, "PNG", optimize=True)
+    os.replace(tmp, dest)
+
+    sprite_map = {
+        "manual_id": manual_id,
+        "version": signature,
+        "image_url": _sprite_url(manual_id, signature),
+        "format": fmt,
+        "width": sheet.width,
+        "height": sheet.height,
+        "cell": {"width": cell_w, "height": cell_h},
+        "steps": steps,
+    }
+    dest.with_suffix(".json").write_text(json.dumps(sprite_map))
+
+    # Older sheets for this manual are superseded
+    for old in SPRITE_CACHE_DIR.glob(f"{manual_id}_*"):
+        if not old.name.startswith(f"{manual_id}_{signature}"):
+            old.unlink(missing_ok=True)
+    print(f"[Sprites] Manual {manual_id}: {len(steps)} steps -> {dest.name} ({dest.stat().st_size} bytes)")
+    return sprite_map
+
+
+def _load(manual_id: int, signature: str) -> Optional[dict]:
+    """Load a sheet built by a previous process, if its image and map are both on disk."""
+    path = sprite_path(manual_id, signature, sprite_format())
+    try:
+        if path.exists():
+            return json.loads(path.with_suffix(".json").read_text())
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def get_step_sprite(manual_id: int) -> Optional[dict]:
+    """
+    Return the sprite map for a manual, building the sheet if the step images
+    changed. None when the manual has no step images or Pillow is missing.
+    """
+    if Image is None:
+        return None
+    assets = get_step_assets(manual_id)
+    if not assets:
+        return None
+    signature = _signature(assets)
+    with _sprites_lock:
+        cached = _sprites.get(manual_id)
+        if cached and cached[0] == signature:
+            _stats["hits"] += 1
+            return cached[1]
+
+    with _build_lock:
+        sprite_map = _load(manual_id, signature)
+        if sprite_map is None:
+            sprite_map = _build(manual_id, assets, signature)
+            _stats["builds"] += 1
+    with _sprites_lock:
+        _sprites[manual_id] = (signature, sprite_map)
+    return sprite_map
+
+
+def get_sprite_image(manual_id: int) -> Optional[Tuple[Path, str]]:
+    """Return (sheet path, version) for a manual's current sprite, or None."""
+    sprite_map = get_step_sprite(manual_id)
+    if sprite_map is None:
+        return None
+    return sprite_path(manual_id, sprite_map["version"], sprite_map["format"]), sprite_map["version"]
+
+
+def invalidate_step_sprite(manual_id: Optional[int] = None) -> None:
+    """Forget the in-memory sprite map for one manual (or all); the next request re-checks the signature."""
+    with _sprites_lock:
+        if manual_id is None:
+            _sprites.clear()
+        else:
+            _sprites.pop(manual_id, None)
+
+
+def get_step_sprite_stats() -> dict:
+    with _sprites_lock:
+        return dict(_stats, manuals=len(_sprites))
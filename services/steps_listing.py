@@ -0,0 +1,142 @@
+"""
+Pre-serialized GET /api/manuals/{id}/steps responses.
+
+Building the steps listing takes a get_manual() and get_steps_for_manual()
+round trip (plus a filesystem fallback when the DB has no steps), normalizes
+every step and merges in narration URLs. The result only changes when steps
+are ingested, a description is stored or narration is rendered, so
+get_steps_listing() keeps the encoded JSON body per manual together with a
+strong ETag (content hash):
+
+  - repeat requests are answered from memory without touching the DB, or with
+    304 Not Modified when the client's If-None-Match matches
+  - writers call invalidate_steps_listing(manual_id) after changing any of the
+    inputs (segmentation, description store, narration preload); this bumps a
+    per-manual generation, and a build that started before the bump is
+    returned to its caller but not cached
+  - the manual directory's mtime is recorded at build time, so step images
+    added or removed on disk also trigger a rebuild (one stat() per request)
+  - step image URLs carry ?v=<content hash> (services/static_assets.py) so
+    they can be cached as immutable, and each step has a WebP "srcset" of
+    resized variants (services/image_variants.py)
+"""
+import hashlib
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from . import db as db_helper
+from .manual_assets import MANUALS_DIR, get_step_assets, manual_exists
+from .narration import get_narration_urls
+from .serialization import dumps
+from .static_assets import versioned_url
+from .image_variants import variant_srcset
+
+# manual_id -> (directory mtime_ns, body bytes, etag)
+_listings: Dict[int, Tuple[Optional[int], bytes, str]] = {}
+_listings_lock = threading.Lock()
+# manual_id (None = all manuals) -> invalidation count; a build is only cached if it did not change meanwhile
+_generations: Dict[Optional[int], int] = {}
+
+_stats = {"builds": 0, "hits": 0}
+
+
+def normalize_step(s: dict) -> dict:
+    """Ensure each step has id (for UI keys) and consistent shape."""
+    n = s.get("step_number")
+    return {
+        "id": n,
+        "step_number": n,
+        "title": f"Step {n}" if n is not None else None,
+        "image_url": s.get("image_url"),
+        "description": s.get("description"),
+        "narration_url": s.get("narration_url"),
+        "orientation_narration_url": s.get("orientation_narration_url"),
+        "srcset": s.get("srcset"),
+    }
+
+
+def _dir_mtime(manual_id: int) -> Optional[int]:
+    try:
+        return (MANUALS_DIR / str(manual_id)).stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def build_steps_listing(manual_id: int) -> Optional[dict]:
+    """
+    Build the {"steps": [...]} listing from the DB, falling back to the step
+    image index when the DB has no steps. Returns None if the manual is unknown.
+    """
+    manual = db_helper.get_manual(manual_id)
+    if manual is None and not manual_exists(manual_id):
+        return None
+    assets = get_step_assets(manual_id)
+    steps = db_helper.get_steps_for_manual(manual_id)
+    if not steps:
+        base_url = os.getenv("APP_URL", "http://localhost:4000").rstrip("/")
+        steps = [
+            {
+                "step_number": n,
+                "image_url": f"{base_url}/manuals/{manual_id}/{asset['path'].name}",
+                "description": None,
+            }
+            for n, asset in assets.items()
+        ]
+    narration = get_narration_urls(manual_id)
+    normalized = [normalize_step({**s, **narration.get(s.get("step_number"), {})}) for s in steps]
+    # Content-hashed image URLs can be cached as immutable by browsers and CDNs
+    for step in normalized:
+        asset = assets.get(step["step_number"])
+        url = step["image_url"]
+        if asset and url and url.endswith(f"/{asset['path'].name}"):
+            step["image_url"] = versioned_url(url, asset["path"])
+        if asset:
+            step["srcset"] = variant_srcset(manual_id, step["step_number"], asset["path"])
+    # Object with "steps" key so frontends using response.steps get the list
+    return {"steps": normalized}
+
+
+def get_steps_listing(manual_id: int) -> Optional[Tuple[bytes, str]]:
+    """Return (JSON body, ETag) for a manual's steps listing, or None if the manual is unknown."""
+    dir_mtime = _dir_mtime(manual_id)
+    with _listings_lock:
+        cached = _listings.get(manual_id)
+        if cached and cached[0] == dir_mtime:
+            _stats["hits"] += 1
+            return cached[1], cached[2]
+        generation = (_generations.get(None, 0), _generations.get(manual_id, 0))
+
+    listing = build_steps_listing(manual_id)
+    if listing is None:
+        return None
+    body = dumps(listing)
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    with _listings_lock:
+        _stats["builds"] += 1
+        if (_generations.get(None, 0), _generations.get(manual_id, 0)) == generation:
+            _listings[manual_id] = (dir_mtime, body, etag)
+    return body, etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if an If-None-Match header value matches etag (weak comparison, as RFC 9110 requires)."""
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return "*" in candidates or etag in (c[2:] if c.startswith("W/") else c for c in candidates)
+
+
+def invalidate_steps_listing(manual_id: Optional[int] = None) -> None:
+    """Drop the prebuilt listing for one manual (or all) so the next request rebuilds it."""
+    with _listings_lock:
+        _generations[manual_id] = _generations.get(manual_id, 0) + 1
+        if manual_id is None:
+            _listings.clear()
+        else:
+            _listings.pop(manual_id, None)
+
+
+def get_steps_listing_stats() -> dict:
+    with _listings_lock:
+        return dict(_stats, manuals=len(_listings))
@@ -12,38 +12,19 @@ preload_manual_step_explanations() is called at startup in a background thread
 to warm the cache for all existing manuals so the first user request is fast.
 """
 import os
-import re
 import replicate
-from pathlib import Path
-from typing import List
 from dotenv import load_dotenv
 
 from . import db as db_helper
 from .db_columns import StepColumn
+from .replicate_files import open_vision_inputs
+from .metrics import track_replicate
+from .manual_assets import discover_step_numbers, find_step_image
+from .steps_listing import invalidate_steps_listing
 
 parent_env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
 load_dotenv(parent_env_path)
 
-MANUALS_DIR = Path(__file__).resolve().parent.parent / "public" / "manuals"
-
-
-def discover_step_numbers(manual_id: int) -> List[int]:
-    """
-    Find all step numbers that have an image in public/manuals/<manual_id>/ (step1.png, step2.jpg, etc.).
-    Returns sorted list of step numbers for that manual.
-    """
-    manual_dir = MANUALS_DIR / str(manual_id)
-    if not manual_dir.exists():
-        return []
-    step_nums = set()
-    pattern = re.compile(r"^step(\d+)\.(png|jpg|jpeg)$", re.IGNORECASE)
-    for path in manual_dir.iterdir():
-        if path.is_file():
-            m = pattern.match(path.name)
-            if m:
-                step_nums.add(int(m.group(1)))
-    return sorted(step_nums)
-
 
 def preload_manual_step_explanations(manual_id: int = 1) -> None:
     """
@@ -77,16 +58,7 @@ def get_step_explanation(manual_id: int = 1, step_number: int = None):
         return cached
 
     # Find the image file in public/manuals/<manual_id>/
-    manual_dir = MANUALS_DIR / str(manual_id)
-    image_path = None
-    for ext in [".png", ".jpg"]:
-        potential_path = manual_dir / f"step{step_number}{ext}"
-        if potential_path.exists():
-            image_path = potential_path
-            break
-
-    if not image_path:
-        raise FileNotFoundError(f"Step image not found for manual {manual_id} step {step_number}")
+    image_path = find_step_image(manual_id, step_number)
 
     # Ensure manual and step rows exist so we can store the description later
     base_url = os.getenv("APP_URL", "http://localhost:4000").rstrip("/")
@@ -95,12 +67,12 @@ def get_step_explanation(manual_id: int = 1, step_number: int = None):
 
     # Call GPT-4o via Replicate with the step image
     response_parts = []
-    with open(image_path, "rb") as img_file:
+    with open_vision_inputs(image_path) as image_input, track_replicate("text_extraction", "openai/gpt-4o"):
         try:
             for event in replicate.stream(
                 "openai/gpt-4o",
                 input={
-                    "image_input": [img_file],
+                    "image_input": image_input,
                     "prompt": "Provide a detailed step-by-step description of the assembly instructions shown in this image. Be clear and concise."
                 }
             ):
@@ -114,6 +86,7 @@ def get_step_explanation(manual_id: int = 1, step_number: int = None):
     # store into DB (safe no-op if DB not configured)
     try:
         db_helper.store_value(manual_id, step_number, StepColumn.DESCRIPTION, description_text)
+        invalidate_steps_listing(manual_id)
     except Exception:
         # log in the future.
         pass
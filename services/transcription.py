@@ -2,85 +2,204 @@
 Audio transcription using OpenAI Whisper large-v3 via Replicate.
 
 transcribe_audio() accepts base64-encoded audio (with or without a data URI
-prefix), writes it to a temp file with the correct extension, calls Replicate,
-and returns {"text": "transcription string"}.
+prefix), decodes it into memory and feeds the buffer directly to Replicate —
+no temp files. It returns {"text": "transcription string", "metrics": {...}}.
+
+transcribe_audio_file() accepts an already-open binary file (e.g. a multipart
+upload) and passes it to Replicate as-is, skipping the base64 decode.
+
+transcribe_audio_bytes() is the shared in-memory pipeline:
+  1. Enforce MAX_AUDIO_BYTES (AudioTooLargeError → HTTP 413)
+  2. For WAV input, downmix to mono, resample to 16 kHz and trim leading and
+     trailing silence locally (services/audio_processing.py) to shrink the upload
+  3. Call Whisper on an in-memory buffer
+  4. Report received/uploaded bytes and preprocessing/model latency
+
+transcription_executor is a bounded pool used by the /ws/transcribe endpoint
+to transcribe VAD-split utterances in parallel while the user is still talking.
 
 Supported input formats: webm/opus (default from frontend), wav, mp3, ogg.
-The frontend sends MediaRecorder output as webm/opus.
+The frontend sends MediaRecorder output as webm/opus, which is passed through
+unchanged (it cannot be decoded without ffmpeg and is already compressed).
 """
 import os
+import io
 import base64
-import tempfile
+import time
 import traceback
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO
 
 import replicate
 
+from .audio_processing import prepare_wav_for_whisper
+from .metrics import track_replicate
+
 # Use the Replicate-hosted OpenAI Whisper large-v3 model
 # Version hash from https://replicate.com/openai/whisper/versions
 WHISPER_VERSION = "3c08daf437fe359eb158a5123c395673f0a113dd8b4bd01ddce5936850e2a981"
 
+# Reject clips larger than this (decoded bytes); matches OpenAI's 25 MB Whisper limit
+MAX_AUDIO_BYTES = int(os.getenv("MAX_AUDIO_BYTES", str(25 * 1024 * 1024)))
 
-def transcribe_audio(audio_base64: str) -> dict:
-    """
-    Transcribe base64-encoded audio using Replicate's Whisper model.
+TRANSCRIBE_CONCURRENCY = int(os.getenv("TRANSCRIBE_CONCURRENCY", "4"))
+transcription_executor = ThreadPoolExecutor(max_workers=TRANSCRIBE_CONCURRENCY, thread_name_prefix="whisper")
 
-    Args:
-        audio_base64: Base64-encoded audio data (may include data URI prefix)
 
-    Returns:
-        dict with "text" key containing the transcription
-    """
-    # Detect file extension from data URI prefix if present
-    ext = ".webm"  # default — frontend sends webm/opus
-    if "," in audio_base64:
-        header = audio_base64.split(",", 1)[0]  # e.g. "data:audio/webm;base64"
-        if "wav" in header:
-            ext = ".wav"
-        elif "mp3" in header:
-            ext = ".mp3"
-        elif "ogg" in header:
-            ext = ".ogg"
-        audio_base64 = audio_base64.split(",", 1)[1]
+class AudioTooLargeError(ValueError):
+    """Raised when an audio clip exceeds MAX_AUDIO_BYTES."""
 
-    audio_bytes = base64.b64decode(audio_base64)
-    print(f"[Transcription] Received {len(audio_bytes)} bytes of audio (ext={ext})")
 
-    # Write to a temp file so Replicate can read it
-    with tempfile.NamedTemporaryFile(suffix=ext, delete=False) as tmp:
-        tmp.write(audio_bytes)
-        tmp_path = tmp.name
+def audio_extension(content_type: str = "", filename: str = "") -> str:
+    """Guess the audio file extension from a MIME type or filename (default .webm)."""
+    hint = f"{content_type or ''} {filename or ''}".lower()
+    if "wav" in hint:
+        return ".wav"
+    if "mp3" in hint or "mpeg" in hint:
+        return ".mp3"
+    if "ogg" in hint:
+        return ".ogg"
+    return ".webm"
+
+
+def _check_size(size: int) -> None:
+    if size > MAX_AUDIO_BYTES:
+        raise AudioTooLargeError(
+            f"Audio is {size} bytes; the limit is {MAX_AUDIO_BYTES} bytes"
+        )
 
-    try:
-        print(f"[Transcription] Calling Whisper via replicate (version={WHISPER_VERSION[:12]}...)")
 
-        # Use the version-based API to avoid 404 with model shortname
+def _run_whisper(audio) -> dict:
+    """Call Whisper on a file object and normalize the output to {"text": ...}."""
+    print(f"[Transcription] Calling Whisper via replicate (version={WHISPER_VERSION[:12]}...)")
+
+    # Use the version-based API to avoid 404 with model shortname
+    with track_replicate("transcription", "openai/whisper"):
         output = replicate.run(
             f"openai/whisper:{WHISPER_VERSION}",
-            input={"audio": open(tmp_path, "rb")},
+            input={"audio": audio},
         )
 
-        print(f"[Transcription] Raw output: {repr(output)}")
+    print(f"[Transcription] Raw output: {repr(output)}")
+
+    # The Whisper model returns a dict with "transcription" key
+    transcription = ""
+    if isinstance(output, dict):
+        transcription = output.get("transcription", output.get("text", ""))
+    elif isinstance(output, str):
+        transcription = output
+    else:
+        transcription = str(output)
+
+    print(f"[Transcription] Result: '{transcription.strip()}'")
+    return {"text": transcription.strip()}
+
+
+class _NamedStream(io.RawIOBase):
+    """
+    Read-only view of an upload stream that carries a filename, so Replicate
+    can infer the content type (spooled upload files have no usable name).
+    """
+
+    def __init__(self, stream: BinaryIO, name: str):
+        self._stream = stream
+        self.name = name
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._stream.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def seekable(self) -> bool:
+        return True
 
-        # The Whisper model returns a dict with "transcription" key
-        transcription = ""
-        if isinstance(output, dict):
-            transcription = output.get("transcription", output.get("text", ""))
-        elif isinstance(output, str):
-            transcription = output
-        else:
-            transcription = str(output)
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._stream.seek(offset, whence)
 
-        print(f"[Transcription] Result: '{transcription.strip()}'")
-        return {"text": transcription.strip()}
+    def tell(self) -> int:
+        return self._stream.tell()
 
+
+def _transcribe(audio, received_bytes: int, upload_bytes: int, preprocess_s: float) -> dict:
+    start = time.perf_counter()
+    try:
+        result = _run_whisper(audio)
     except Exception as e:
         print(f"[Transcription] Whisper failed: {repr(e)}")
         traceback.print_exc()
         raise
-    finally:
-        # Clean up temp file
+    metrics = {
+        "received_bytes": received_bytes,
+        "upload_bytes": upload_bytes,
+        "preprocess_ms": round(preprocess_s * 1000, 1),
+        "whisper_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+    print(f"[Transcription] Metrics: {metrics}")
+    result["metrics"] = metrics
+    return result
+
+
+def transcribe_audio_bytes(audio_bytes: bytes, ext: str = ".webm") -> dict:
+    """
+    Transcribe decoded audio held in memory. WAV input is downmixed, resampled
+    to 16 kHz and silence-trimmed before upload.
+    """
+    _check_size(len(audio_bytes))
+
+    start = time.perf_counter()
+    prepared = audio_bytes
+    if ext == ".wav":
         try:
-            os.unlink(tmp_path)
-        except OSError:
-            pass
+            prepared = prepare_wav_for_whisper(audio_bytes)
+        except Exception as e:
+            print(f"[Transcription] Preprocessing skipped: {e}")
+    preprocess_s = time.perf_counter() - start
+
+    buffer = io.BytesIO(prepared)
+    buffer.name = f"audio{ext}"
+    return _transcribe(buffer, len(audio_bytes), len(prepared), preprocess_s)
+
+
+def transcribe_audio_file(audio_file: BinaryIO, ext: str = ".webm") -> dict:
+    """
+    Transcribe an open binary audio file (e.g. an UploadFile's spooled file).
+    Compressed formats are streamed to Replicate without being read into memory;
+    WAV is read so it can be preprocessed.
+    """
+    audio_file.seek(0, io.SEEK_END)
+    size = audio_file.tell()
+    audio_file.seek(0)
+    _check_size(size)
+
+    if ext == ".wav":
+        return transcribe_audio_bytes(audio_file.read(), ext)
+
+    print(f"[Transcription] Streaming uploaded audio (ext={ext})")
+    return _transcribe(_NamedStream(audio_file, f"audio{ext}"), size, size, 0.0)
+
+
+def transcribe_audio(audio_base64: str) -> dict:
+    """
+    Transcribe base64-encoded audio using Replicate's Whisper model.
+
+    Args:
+        audio_base64: Base64-encoded audio data (may include data URI prefix)
+
+    Returns:
+        dict with "text" (the transcription) and "metrics" (upload bytes, latency)
+    """
+    # Detect file extension from data URI prefix if present
+    ext = ".webm"  # default — frontend sends webm/opus
+    if "," in audio_base64:
+        header, audio_base64 = audio_base64.split(",", 1)  # e.g. "data:audio/webm;base64"
+        ext = audio_extension(header)
+
+    # Reject oversized clips before decoding (base64 is 4 chars per 3 bytes)
+    _check_size(len(audio_base64) * 3 // 4)
+
+    audio_bytes = base64.b64decode(audio_base64)
+    print(f"[Transcription] Received {len(audio_bytes)} bytes of audio (ext={ext})")
+    return transcribe_audio_bytes(audio_bytes, ext)
@@ -4,11 +4,42 @@ Text-to-speech synthesis using Kokoro-82m via Replicate.
 synthesize_speech() strips markdown formatting from the input text, calls the
 Kokoro model, and returns the URL of the generated audio file.
 
+Audio is cached locally in cache/tts/ and served from the /tts_audio static
+mount. Text is normalized and split into sentences; each sentence clip is
+keyed by (normalized text, voice, model version), so repeated step
+descriptions, checklist items and orientation messages are never synthesized
+twice, and a long answer only synthesizes the sentences that have not been
+spoken before. Multi-sentence requests are stitched into one WAV file, itself
+cached under the key of the full text. The directory is kept under
+TTS_CACHE_MAX_BYTES by LRU eviction; a cache hit refreshes the file's mtime
+(at most once per TTS_TOUCH_INTERVAL) so mtime order approximates recency.
+
+Set TTS_CACHE=0 to disable caching and return Replicate's output URL directly.
+
+synthesize_speech_stream() is the streaming variant: sentences are synthesized
+concurrently (bounded by TTS_STREAM_CONCURRENCY) and yielded in order as soon
+as each is ready, so playback can start after the first sentence. The final
+event reports time-to-first-chunk and total time.
+
 Default voice: af_nova (American English female). Other Kokoro voice IDs can be
 passed via the `voice` parameter (e.g. af_bella, am_adam).
 """
+import os
+import re
+import hashlib
+import threading
+import time
 import traceback
+import uuid
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List
+
 import replicate
+import requests
+
+from .metrics import track_replicate
 
 # Kokoro-82m TTS model on Replicate
 KOKORO_MODEL = "jaaari/kokoro-82m"
@@ -17,36 +48,67 @@ KOKORO_VERSION = "f559560eb822dc509045f3921a1921234918b91739db4bf3daab2169b71c7a
 # Default voice — American English female
 DEFAULT_VOICE = "af_nova"
 
+BASE_DIR = Path(__file__).resolve().parent.parent
+TTS_CACHE_DIR = BASE_DIR / "cache" / "tts"
+TTS_URL_PREFIX = "/tts_audio"
 
-def synthesize_speech(text: str, voice: str = DEFAULT_VOICE) -> str:
-    """
-    Convert text to speech using Kokoro-82m via Replicate.
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
 
-    Args:
-        text: The text to speak (should be a sentence or short paragraph)
-        voice: Voice ID (default: af_bella — American English female)
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+TTS_SWEEP_INTERVAL = 300
+TTS_TOUCH_INTERVAL = 3600
 
-    Returns:
-        URL to the generated audio file
-    """
-    if not text or not text.strip():
-        raise ValueError("Text cannot be empty")
+_clip_locks: Dict[str, threading.Lock] = {}
+_clip_locks_guard = threading.Lock()
+_sweep_lock = threading.Lock()
+_last_sweep = 0.0
 
-    # Strip markdown formatting for cleaner speech
+_stats = {"hits": 0, "misses": 0, "evicted": 0}
+
+TTS_STREAM_CONCURRENCY = int(os.getenv("TTS_STREAM_CONCURRENCY", "4"))
+_stream_executor = ThreadPoolExecutor(max_workers=TTS_STREAM_CONCURRENCY, thread_name_prefix="tts")
+
+
+def _cache_enabled() -> bool:
+    return os.getenv("TTS_CACHE", "1") != "0"
+
+
+def normalize_text(text: str) -> str:
+    """Strip markdown formatting and collapse whitespace for cleaner speech and stable cache keys."""
     clean_text = text.strip()
     for ch in ["**", "*", "#", "`", "- ", "• "]:
         clean_text = clean_text.replace(ch, "")
+    return " ".join(clean_text.split())
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split normalized text into sentences (on ., ! or ? followed by whitespace)."""
+    return [s for s in _SENTENCE_SPLIT.split(text) if s.strip()]
+
 
-    print(f"[TTS] Synthesizing: '{clean_text[:80]}...' (voice={voice})")
+def tts_cache_key(text: str, voice: str) -> str:
+    return hashlib.sha256(f"{KOKORO_VERSION}\0{voice}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+
+def audio_url_for(path: Path) -> str:
+    """Public URL of a cached audio file under the /tts_audio mount."""
+    base_url = os.getenv("APP_URL", "http://localhost:4000").rstrip("/")
+    return f"{base_url}{TTS_URL_PREFIX}/{path.name}"
+
+
+def _call_kokoro(text: str, voice: str) -> str:
+    """Run Kokoro on already-normalized text and return the output URL."""
+    print(f"[TTS] Synthesizing: '{text[:80]}...' (voice={voice})")
 
     try:
-        output = replicate.run(
-            f"{KOKORO_MODEL}:{KOKORO_VERSION}",
-            input={
-                "text": clean_text,
-                "voice": voice,
-            },
-        )
+        with track_replicate("tts", KOKORO_MODEL):
+            output = replicate.run(
+                f"{KOKORO_MODEL}:{KOKORO_VERSION}",
+                input={
+                    "text": text,
+                    "voice": voice,
+                },
+            )
 
         print(f"[TTS] Raw output type: {type(output)}, value: {repr(output)[:200]}")
 
@@ -60,3 +122,222 @@ def synthesize_speech(text: str, voice: str = DEFAULT_VOICE) -> str:
         print(f"[TTS] FAILED: {repr(e)}")
         traceback.print_exc()
         raise
+
+
+def _download(url: str, dest: Path) -> None:
+    tmp = dest.with_name(f".{uuid.uuid4().hex}.tmp")
+    try:
+        resp = requests.get(url, stream=True, timeout=60)
+        resp.raise_for_status()
+        with open(tmp, "wb") as f:
+            for chunk in resp.iter_content(chunk_size=8192):
+                f.write(chunk)
+        os.replace(tmp, dest)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _cache_hit(path: Path) -> bool:
+    """True if `path` is cached; refreshes its mtime for LRU eviction."""
+    try:
+        st = path.stat()
+        if time.time() - st.st_mtime > TTS_TOUCH_INTERVAL:
+            os.utime(path)
+    except OSError:
+        return False
+    _stats["hits"] += 1
+    return True
+
+
+def synthesize_clip(text: str, voice: str = DEFAULT_VOICE) -> Path:
+    """
+    Return the cached audio file for normalized `text`, synthesizing and
+    downloading it on a miss. Concurrent requests for the same clip share one
+    Kokoro call.
+    """
+    key = tts_cache_key(text, voice)
+    dest = TTS_CACHE_DIR / f"{key}.wav"
+    if _cache_hit(dest):
+        return dest
+
+    with _clip_locks_guard:
+        lock = _clip_locks.setdefault(key, threading.Lock())
+    try:
+        with lock:
+            if dest.exists():
+                _stats["hits"] += 1
+                return dest
+            _stats["misses"] += 1
+            TTS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            _download(_call_kokoro(text, voice), dest)
+    finally:
+        with _clip_locks_guard:
+            _clip_locks.pop(key, None)
+    _maybe_sweep()
+    return dest
+
+
+def sweep_tts_cache(max_bytes: int = TTS_CACHE_MAX_BYTES) -> int:
+    """Evict least recently used clips until the cache is under max_bytes. Returns files removed."""
+    if not TTS_CACHE_DIR.exists():
+        return 0
+    entries = []
+    for path in TTS_CACHE_DIR.glob("*.wav"):
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for mtime, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    if removed:
+        _stats["evicted"] += removed
+        print(f"[TTS] Evicted {removed} clip(s); {total} bytes remain")
+    return removed
+
+
+def _maybe_sweep() -> None:
+    global _last_sweep
+    if time.time() - _last_sweep < TTS_SWEEP_INTERVAL:
+        return
+    if not _sweep_lock.acquire(blocking=False):
+        return
+    try:
+        _last_sweep = time.time()
+        sweep_tts_cache()
+    except Exception as e:
+        print(f"[TTS] Sweep failed: {e}")
+    finally:
+        _sweep_lock.release()
+
+
+def _concatenate_wavs(clips: List[Path], dest: Path) -> None:
+    """Join WAV clips with identical parameters into one file."""
+    tmp = dest.with_name(f".{uuid.uuid4().hex}.tmp")
+    try:
+        with wave.open(str(tmp), "wb") as out:
+            params = None
+            for clip in clips:
+                with wave.open(str(clip), "rb") as w:
+                    clip_params = (w.getnchannels(), w.getsampwidth(), w.getframerate())
+                    if params is None:
+                        params = clip_params
+                        out.setnchannels(params[0])
+                        out.setsampwidth(params[1])
+                        out.setframerate(params[2])
+                    elif clip_params != params:
+                        raise ValueError("TTS clips have mismatched audio parameters")
+                    out.writeframes(w.readframes(w.getnframes()))
+        os.replace(tmp, dest)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _synthesize_cached(clean_text: str, voice: str) -> Path:
+    sentences = split_sentences(clean_text)
+    if len(sentences) <= 1:
+        return synthesize_clip(clean_text, voice)
+
+    combined = TTS_CACHE_DIR / f"{tts_cache_key(clean_text, voice)}.wav"
+    if _cache_hit(combined):
+        return combined
+
+    clips = [synthesize_clip(sentence, voice) for sentence in sentences]
+    try:
+        _concatenate_wavs(clips, combined)
+    except (wave.Error, ValueError, EOFError) as e:
+        # Not stitchable (e.g. non-WAV output) — synthesize the full text instead
+        print(f"[TTS] Could not join sentence clips ({e}); synthesizing full text")
+        return synthesize_clip(clean_text, voice)
+    _maybe_sweep()
+    return combined
+
+
+def synthesize_to_file(text: str, voice: str = DEFAULT_VOICE) -> Path:
+    """Return the local cached audio file for `text`, synthesizing missing sentences."""
+    if not text or not text.strip():
+        raise ValueError("Text cannot be empty")
+    return _synthesize_cached(normalize_text(text), voice)
+
+
+def synthesize_speech(text: str, voice: str = DEFAULT_VOICE) -> str:
+    """
+    Convert text to speech using Kokoro-82m via Replicate.
+
+    Args:
+        text: The text to speak (should be a sentence or short paragraph)
+        voice: Voice ID (default: af_nova — American English female)
+
+    Returns:
+        URL to the generated audio file (served from /tts_audio when cached)
+    """
+    if not text or not text.strip():
+        raise ValueError("Text cannot be empty")
+
+    # Strip markdown formatting for cleaner speech
+    clean_text = normalize_text(text)
+
+    if not _cache_enabled():
+        return _call_kokoro(clean_text, voice)
+
+    return audio_url_for(_synthesize_cached(clean_text, voice))
+
+
+def _sentence_audio_url(sentence: str, voice: str) -> str:
+    if not _cache_enabled():
+        return _call_kokoro(sentence, voice)
+    return audio_url_for(synthesize_clip(sentence, voice))
+
+
+def synthesize_speech_stream(text: str, voice: str = DEFAULT_VOICE) -> Iterator[dict]:
+    """
+    Yield one {"event": "chunk", ...} per sentence, in order, followed by a
+    {"event": "done", ...} event with timing metrics. All sentences are
+    submitted at once; each chunk is yielded as soon as it and every sentence
+    before it are ready.
+    """
+    if not text or not text.strip():
+        raise ValueError("Text cannot be empty")
+
+    sentences = split_sentences(normalize_text(text))
+    start = time.perf_counter()
+    futures = [_stream_executor.submit(_sentence_audio_url, s, voice) for s in sentences]
+
+    first_chunk_ms = None
+    try:
+        for index, (sentence, future) in enumerate(zip(sentences, futures)):
+            audio_url = future.result()
+            elapsed_ms = round((time.perf_counter() - start) * 1000)
+            if first_chunk_ms is None:
+                first_chunk_ms = elapsed_ms
+                print(f"[TTS] First chunk ready in {first_chunk_ms} ms ({len(sentences)} sentences)")
+            yield {
+                "event": "chunk",
+                "index": index,
+                "text": sentence,
+                "audio_url": audio_url,
+                "elapsed_ms": elapsed_ms,
+            }
+    finally:
+        # Client went away or a sentence failed — don't synthesize the rest
+        for future in futures:
+            future.cancel()
+
+    yield {
+        "event": "done",
+        "chunks": len(sentences),
+        "time_to_first_chunk_ms": first_chunk_ms,
+        "total_ms": round((time.perf_counter() - start) * 1000),
+    }
+
+
+def get_tts_cache_stats() -> dict:
+    """Return clip cache hit/miss/eviction counters."""
+    return dict(_stats)
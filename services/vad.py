@@ -0,0 +1,136 @@
+"""
+Energy-based voice activity detection for streamed microphone audio.
+
+StreamingVAD receives raw 16-bit little-endian mono PCM in arbitrary-sized
+chunks (as they arrive over the /ws/transcribe WebSocket) and splits it into
+utterances:
+
+  - audio is analyzed in FRAME_MS frames; a frame is voiced when its RMS
+    energy exceeds an adaptive threshold (a multiple of the running noise
+    floor, never below audio_processing.SILENCE_FLOOR)
+  - the noise floor starts as the quietest frame of the first
+    NOISE_CALIBRATION_MS, then falls toward any quieter frame (voiced or
+    not) and rises slowly on unvoiced frames, so a stream that opens with
+    speech cannot pin it high
+  - an utterance starts at the first voiced frame (plus a little pre-roll)
+  - it ends after VAD_SILENCE_MS of unvoiced frames, or is force-cut at
+    VAD_MAX_UTTERANCE_MS so long monologues still produce partial results
+
+Each completed utterance is returned as 16 kHz mono WAV bytes ready for
+transcription.transcribe_audio_bytes().
+"""
+import os
+from collections import deque
+from typing import List, Optional
+
+from .audio_processing import (
+    FRAME_MS,
+    SILENCE_FLOOR,
+    WHISPER_SAMPLE_RATE,
+    encode_wav,
+    np,
+    pcm16_to_float,
+    resample,
+)
+
+VAD_SILENCE_MS = int(os.getenv("VAD_SILENCE_MS", "600"))
+VAD_MAX_UTTERANCE_MS = int(os.getenv("VAD_MAX_UTTERANCE_MS", "15000"))
+VAD_MIN_SPEECH_MS = 200
+VAD_PREROLL_MS = 200
+# A frame is voiced when louder than this multiple of the noise floor
+NOISE_MULTIPLIER = 3.0
+# The initial noise floor is the quietest frame in this opening window
+NOISE_CALIBRATION_MS = 200
+# Accepted input sample rates (telephone band through studio audio)
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 48000
+
+
+class StreamingVAD:
+    """Incrementally split a PCM16 stream into speech utterances."""
+
+    def __init__(self, sample_rate: int = WHISPER_SAMPLE_RATE):
+        if np is None:
+            raise RuntimeError("numpy is required for voice activity detection")
+        if not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE:
+            raise ValueError(f"sample_rate must be between {MIN_SAMPLE_RATE} and {MAX_SAMPLE_RATE} Hz")
+        self.sample_rate = sample_rate
+        self.frame_len = max(1, sample_rate * FRAME_MS // 1000)
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._preroll = deque(maxlen=max(1, VAD_PREROLL_MS // FRAME_MS))
+        self._frames: List["np.ndarray"] = []
+        self._voiced_frames = 0
+        self._silent_run = 0
+        self._noise_floor: Optional[float] = None
+        self._calibration_frames = max(1, NOISE_CALIBRATION_MS // FRAME_MS)
+        self._leftover = b""
+
+    def _is_voiced(self, rms: float) -> bool:
+        if self._noise_floor is None:
+            self._noise_floor = rms
+        elif self._calibration_frames > 0:
+            self._noise_floor = min(self._noise_floor, rms)
+        self._calibration_frames -= 1
+        threshold = max(self._noise_floor * NOISE_MULTIPLIER, SILENCE_FLOOR)
+        voiced = rms > threshold
+        if rms < self._noise_floor:
+            # Fall quickly toward quieter frames, even mid-utterance (pauses between words)
+            self._noise_floor = 0.7 * self._noise_floor + 0.3 * rms
+        elif not voiced:
+            # Track a rising background level slowly so speech does not raise it
+            self._noise_floor = 0.95 * self._noise_floor + 0.05 * rms
+        return voiced
+
+    def _finish(self) -> Optional[bytes]:
+        frames, voiced = self._frames, self._voiced_frames
+        self._frames, self._voiced_frames, self._silent_run = [], 0, 0
+        if voiced * FRAME_MS < VAD_MIN_SPEECH_MS:
+            return None
+        samples = resample(np.concatenate(frames), self.sample_rate, WHISPER_SAMPLE_RATE)
+        return encode_wav(samples, WHISPER_SAMPLE_RATE)
+
+    def feed(self, pcm: bytes) -> List[bytes]:
+        """Add PCM16 bytes; return WAV bytes for every utterance completed by them."""
+        pcm = self._leftover + pcm
+        usable = len(pcm) - len(pcm) % 2
+        self._leftover = pcm[usable:]
+        self._pending = np.concatenate([self._pending, pcm16_to_float(pcm[:usable])])
+
+        completed: List[bytes] = []
+        max_frames = VAD_MAX_UTTERANCE_MS // FRAME_MS
+        silence_frames = VAD_SILENCE_MS // FRAME_MS
+        while len(self._pending) >= self.frame_len:
+            frame = self._pending[: self.frame_len]
+            self._pending = self._pending[self.frame_len:]
+            voiced = self._is_voiced(float(np.sqrt(np.mean(frame ** 2))))
+
+            if not self._frames:
+                if voiced:
+                    self._frames = list(self._preroll) + [frame]
+                    self._voiced_frames = 1
+                    self._preroll.clear()
+                else:
+                    self._preroll.append(frame)
+                continue
+
+            self._frames.append(frame)
+            if voiced:
+                self._voiced_frames += 1
+                self._silent_run = 0
+            else:
+                self._silent_run += 1
+
+            if self._silent_run >= silence_frames or len(self._frames) >= max_frames:
+                utterance = self._finish()
+                if utterance:
+                    completed.append(utterance)
+        return completed
+
+    def flush(self) -> Optional[bytes]:
+        """Return the in-progress utterance (if it contains speech) at end of stream."""
+        if len(self._pending) and self._frames:
+            self._frames.append(self._pending)
+        self._pending = np.zeros(0, dtype=np.float32)
+        if not self._frames:
+            return None
+        return self._finish()
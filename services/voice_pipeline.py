@@ -0,0 +1,110 @@
+"""
+End-to-end voice turn: transcribe → chat → TTS in one request.
+
+A voice question used to take three client round trips (/api/transcribe,
+/chat, /api/tts), each waiting for the previous one. run_voice_turn() chains
+the stages server-side and yields events as soon as each is available:
+
+  {"event": "transcript", "text": "..."}
+  {"event": "final", "payload": {...}}                 — validated chat payload
+  {"event": "audio", "index": 0, "text": "...", "audio_url": "..."}  — per sentence
+  {"event": "timings", "transcribe_ms": ..., "chat_ms": ..., ...}
+
+Stages overlap where the data allows:
+  - while Whisper runs, the step/lasso images are resolved to upload-once
+    Replicate file references so the chat call does not pay for the upload
+  - the chat payload is validated JSON (it only arrives complete), so TTS
+    starts the moment it does: every sentence is submitted concurrently and
+    the first sentence's audio is emitted without waiting for the rest
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
+
+from .chat_service import get_chat_response_stream, warm_image_inputs
+from .transcription import transcribe_audio
+from .tts import DEFAULT_VOICE, synthesize_speech_stream
+
+_warmup_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="voice-warmup")
+
+
+def payload_speech_text(payload: dict) -> str:
+    """Flatten a qa / procedural chat payload into the text to speak."""
+    if payload.get("type") == "qa":
+        return payload.get("answer", "")
+    parts = [payload.get("summary", "")]
+    for idx, step in enumerate(payload.get("steps") or [], start=1):
+        parts.append(f"Step {idx}. {step.rstrip('.')}.")
+    for mistake in payload.get("common_mistakes") or []:
+        parts.append(f"Watch out: {mistake.rstrip('.')}.")
+    return " ".join(p for p in parts if p)
+
+
+def _ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def run_voice_turn(
+    manual_id: int,
+    step_number: int,
+    audio_base64: str,
+    conversation_history: Optional[list[dict]] = None,
+    image_url: Optional[str] = None,
+    secondary_image_url: Optional[str] = None,
+    intent: Optional[str] = None,
+    voice: str = DEFAULT_VOICE,
+) -> Iterator[dict]:
+    """Yield transcript, chat payload, per-sentence audio and timing events."""
+    start = time.perf_counter()
+    timings: dict = {}
+
+    warmup = None
+    if image_url or secondary_image_url:
+        warmup = _warmup_executor.submit(warm_image_inputs, image_url, secondary_image_url)
+
+    stage = time.perf_counter()
+    transcript = transcribe_audio(audio_base64)["text"]
+    timings["transcribe_ms"] = _ms(stage)
+    yield {"event": "transcript", "text": transcript}
+
+    if not transcript:
+        timings["total_ms"] = _ms(start)
+        yield {"event": "timings", **timings}
+        return
+
+    if warmup is not None:
+        try:
+            warmup.result()
+        except Exception as e:
+            print(f"[Voice] Image warmup failed: {e}")
+
+    stage = time.perf_counter()
+    payload = None
+    for chunk in get_chat_response_stream(
+        manual_id=manual_id,
+        step_number=step_number,
+        user_message=transcript,
+        conversation_history=conversation_history,
+        image_url=image_url,
+        secondary_image_url=secondary_image_url,
+        intent=intent,
+    ):
+        payload = chunk.get("payload")
+        yield chunk
+    timings["chat_ms"] = _ms(stage)
+
+    speech_text = payload_speech_text(payload or {})
+    if speech_text.strip():
+        stage = time.perf_counter()
+        for event in synthesize_speech_stream(speech_text, voice):
+            if event["event"] == "chunk":
+                if "time_to_first_audio_ms" not in timings:
+                    timings["time_to_first_audio_ms"] = _ms(start)
+                yield {**event, "event": "audio"}
+            else:
+                timings["tts_first_chunk_ms"] = event["time_to_first_chunk_ms"]
+        timings["tts_ms"] = _ms(stage)
+
+    timings["total_ms"] = _ms(start)
+    print(f"[Voice] Turn timings: {timings}")
+    yield {"event": "timings", **timings}